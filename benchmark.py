@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Headless benchmark suite for highlighting, editing and file operations.
+
+Runs under QT_QPA_PLATFORM=offscreen on synthetic documents, writes the
+timings and the memory of each loaded editor to JSON and optionally compares
+them against a stored baseline:
+
+    python benchmark.py --output results.json --baseline benchmark_baseline.json
+    python benchmark.py --save-baseline benchmark_baseline.json
+
+The exit status is 1 if any timing or memory use regressed beyond the tolerance.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import sys
+import os
+
+# Add the ursus package to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+DOCUMENT_SIZES = [1000, 10000, 100000]
+# Fraction of lines that are headings, and of the others that contain emphasis
+DOCUMENT_PROFILES = {
+    "sparse": (0.01, 0.05),
+    "dense": (0.10, 0.80),
+}
+CURSOR_MOVES = 200
+KEYSTROKES = 50
+REPEATS = 5
+DEFAULT_TOLERANCE = 0.25
+
+
+def generate_document(line_count, heading_density=0.05, emphasis_density=0.3, seed=0):
+    """Generate a reproducible markdown document with headings, bold and italic text."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(line_count):
+        if rng.random() < heading_density:
+            lines.append(f"{'#' * rng.randint(1, 5)} Section {i}")
+        elif rng.random() < emphasis_density:
+            lines.append(f"Some **bold text** and *italic text* with an _underscore span_ on line {i}")
+        else:
+            lines.append(f"Plain text without any markdown emphasis on line {i}")
+    return "\n".join(lines)
+
+
+def unit(key):
+    """Return the unit of a result: memory in MB, everything else in ms."""
+    return "MB" if key.startswith("memory") else "ms"
+
+
+def resident_memory():
+    """Return the resident set size of this process in MB, or None if unknown."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def median_time(func, repeats=REPEATS):
+    """Return the median wall time of func in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_lexer(text):
+    """Time a cold and a cached tokenization pass over a document, without Qt."""
+    from ursus.lexer import tokenize, clear_cache
+
+    lines = text.split("\n")
+
+    def tokenize_all():
+        for line in lines:
+            tokenize(line)
+
+    clear_cache()
+    start = time.perf_counter()
+    tokenize_all()
+    cold = (time.perf_counter() - start) * 1000
+    return {"lexer_cold": cold, "lexer_cached": median_time(tokenize_all)}
+
+
+def benchmark_widget(widget, line_count):
+    """Time highlighting and editing commands on a shown editor with a document loaded."""
+    from PySide6.QtCore import QMimeData
+    from PySide6.QtGui import QTextCursor
+
+    results = {}
+    document = widget.document()
+    highlighter = widget.highlighter
+    highlighter.stop_progressive()
+
+    # The way the editor highlights a whole document; QSyntaxHighlighter.rehighlight
+    # lays a shown QTextEdit out again after every block
+    results["rehighlight"] = median_time(
+        lambda: highlighter.highlight_blocks(document.begin(), document.lastBlock()), repeats=3)
+
+    # Typing a character re-highlights the edited block (and more if its state changes)
+    cursor = QTextCursor(document.findBlockByNumber(line_count // 2))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+
+    def keystrokes():
+        for _ in range(KEYSTROKES):
+            cursor.insertText("x")
+
+    results["keystroke"] = median_time(keystrokes) / KEYSTROKES
+
+    step = max(1, line_count // CURSOR_MOVES)
+
+    def cursor_moves():
+        for i in range(CURSOR_MOVES):
+            block = document.findBlockByNumber((i * step) % line_count)
+            highlighter.set_cursor_position(block.position() + 3)
+
+    results["cursor_move"] = median_time(cursor_moves) / CURSOR_MOVES
+
+    # Toggle twice per run so the document ends up unchanged
+    def select_word():
+        block = document.findBlockByNumber(line_count // 2 + 1)
+        selection = QTextCursor(block)
+        selection.movePosition(QTextCursor.NextWord)
+        selection.movePosition(QTextCursor.EndOfWord, QTextCursor.KeepAnchor)
+        widget.setTextCursor(selection)
+
+    def toggle(command):
+        select_word()
+        command()
+        command()
+
+    results["toggle_bold"] = median_time(lambda: toggle(widget.toggle_bold)) / 2
+    results["toggle_italic"] = median_time(lambda: toggle(widget.toggle_italic)) / 2
+
+    # Paste a tenth of the document's lines in the middle, then undo it
+    pasted = QMimeData()
+    pasted.setText(generate_document(max(1, line_count // 10), seed=1))
+    paste_cursor = QTextCursor(document.findBlockByNumber(line_count // 2))
+    widget.setTextCursor(paste_cursor)
+    start = time.perf_counter()
+    widget.insertFromMimeData(pasted)
+    results["paste"] = (time.perf_counter() - start) * 1000
+    document.undo()
+    return results
+
+
+def editor_class(editor_mode):
+    from ursus.main_widget import MainWidget, PlainTextMainWidget
+    return PlainTextMainWidget if editor_mode == "plain" else MainWidget
+
+
+def load_editor(app, editor_mode, text):
+    """Return a shown editor with text loaded and fully highlighted.
+
+    Editors are shown (offscreen) because a hidden QTextEdit defers its layout,
+    which would hide what laying the text out costs.
+    """
+    widget = editor_class(editor_mode)(text_size=20)
+    widget.resize(800, 600)
+    widget.show()
+    widget.load_text(text)
+    # Run the progressive pass to the end here, without its timer firing later
+    highlighter = widget.highlighter
+    while highlighter.highlight_frontier is not None:
+        highlighter.highlight_next_chunk()
+    highlighter.progressive_timer.stop()
+    app.processEvents()
+    return widget
+
+
+def measure_memory(line_count, profile, editor_mode):
+    """Print the MB a shown, loaded and fully highlighted document adds to a
+    fresh process."""
+    from PySide6.QtCore import QEvent
+    from PySide6.QtGui import QTextCursor
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+
+    def load(text):
+        widget = load_editor(app, editor_mode, text)
+        # Scrolling to the end finishes the layout of the whole document
+        widget.moveCursor(QTextCursor.End)
+        widget.ensureCursorVisible()
+        app.processEvents()
+        return widget
+
+    # Fonts, formats and the like are loaded once per process, so they are not counted
+    load(generate_document(100)).deleteLater()
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    text = generate_document(line_count, *DOCUMENT_PROFILES[profile])
+    before = resident_memory()
+    if before is None:
+        return
+    widget = load(text)  # Kept alive until it is measured
+    print(resident_memory() - before)
+
+
+def benchmark_memory(line_count, profile, editor_mode):
+    """Return the memory a loaded document takes, in MB, or None if it cannot be measured.
+
+    Memory freed by earlier benchmarks is reused rather than returned to the
+    system, so each document is measured in a process of its own.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--editor", editor_mode,
+               "--measure-memory", str(line_count), profile]
+    output = subprocess.run(command, capture_output=True, text=True).stdout.strip()
+    try:
+        return float(output.splitlines()[-1])
+    except (IndexError, ValueError):
+        return None
+
+
+def benchmark_file_operations(app, text, editor_mode):
+    """Time opening, saving and rendering copy-as-HTML through MainWindow."""
+    from ursus.main_window import MainWindow
+
+    results = {}
+    window = MainWindow(text_size=20, editor_mode=editor_mode)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.md")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+        def open_file():
+            window.load_file(path)
+            while window.buffer.file_loader is not None:
+                app.processEvents()
+
+        results["open"] = median_time(open_file, repeats=3)
+
+        def save_file():
+            window._save_file(path)
+            window.wait_for_save()
+            # The queued saved and finished handlers are part of a save
+            app.processEvents()
+
+        results["save"] = median_time(save_file, repeats=3)
+        # Close the window while its files still exist
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+
+    try:
+        import mistune  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        from ursus.html_export import HtmlCache
+        cache = HtmlCache()
+        start = time.perf_counter()
+        cache.render(text)
+        results["html_copy_cold"] = (time.perf_counter() - start) * 1000
+        results["html_copy_cached"] = median_time(lambda: cache.render(text), repeats=3)
+    return results
+
+
+def run_benchmarks(sizes, editor_mode):
+    """Run every benchmark over each document size and profile."""
+    from PySide6.QtCore import QSettings, QEvent
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    # Keep the recovery journal and settings of benchmark windows away from
+    # the user's sessions, text size and theme
+    app.setApplicationName("ursus-benchmark")
+    with tempfile.TemporaryDirectory() as settings_dir:
+        for settings_format in (QSettings.NativeFormat, QSettings.IniFormat):
+            QSettings.setPath(settings_format, QSettings.UserScope, settings_dir)
+
+        results = {}
+        for line_count in sizes:
+            for profile, (heading_density, emphasis_density) in DOCUMENT_PROFILES.items():
+                text = generate_document(line_count, heading_density, emphasis_density)
+                timings = benchmark_lexer(text)
+
+                start = time.perf_counter()
+                widget = load_editor(app, editor_mode, text)
+                timings["load_highlighted"] = (time.perf_counter() - start) * 1000
+                timings.update(benchmark_widget(widget, line_count))
+                widget.deleteLater()
+                app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+                timings.update(benchmark_file_operations(app, text, editor_mode))
+                memory = benchmark_memory(line_count, profile, editor_mode)
+                if memory is not None:
+                    timings["memory"] = memory
+
+                for name, value in timings.items():
+                    key = f"{name}/{line_count}/{profile}"
+                    results[key] = value
+                    print(f"{key:<40} {value:10.3f}{unit(key)}")
+        return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return descriptions of timings slower than baseline by more than tolerance."""
+    regressions = []
+    for key, value in sorted(results.items()):
+        reference = baseline.get(key)
+        if reference and value > reference * (1 + tolerance):
+            regressions.append(f"{key}: {value:.3f}{unit(key)} vs {reference:.3f}{unit(key)} baseline "
+                               f"(+{(value / reference - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ursus benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DOCUMENT_SIZES, help="document sizes in lines")
+    parser.add_argument("--editor", choices=["rich", "plain"], default="rich",
+                        help="benchmark the QTextEdit (rich) or QPlainTextEdit (plain) editor")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare results against this JSON file")
+    parser.add_argument("--save-baseline", help="write results as a new baseline to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown relative to the baseline (0.25 = 25%%)")
+    # Used by benchmark_memory to measure one document in a fresh process
+    parser.add_argument("--measure-memory", nargs=2, metavar=("LINES", "PROFILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_memory:
+        line_count, profile = args.measure_memory
+        measure_memory(int(line_count), profile, args.editor)
+        return 0
+
+    results = run_benchmarks(args.sizes, args.editor)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
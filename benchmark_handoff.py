@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Compare a cold start of the editor with handing a file to a running one.
+
+Runs headless (QT_QPA_PLATFORM=offscreen) in a temporary runtime and data
+directory, so a real editor session is never contacted:
+
+    python benchmark_handoff.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+# Start-up until the window is shown with the file loaded, as `ursus FILE` would without a running editor
+COLD_START = """
+import sys
+from PySide6.QtWidgets import QApplication
+from ursus.main_window import MainWindow
+app = QApplication(sys.argv)
+window = MainWindow(text_size=20)
+window.show()
+window.load_file(sys.argv[1])
+while window.buffer.file_loader is not None:
+    app.processEvents()
+window.close()
+"""
+SERVER_START_TIMEOUT = 30
+
+
+def time_command(command, env):
+    start = time.perf_counter()
+    subprocess.run(command, env=env, cwd=ROOT, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def wait_for_server(address, process):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while not os.path.exists(address):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("the editor did not start listening for forwarded files")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold start with single-instance hand-off.")
+    parser.add_argument("--runs", type=int, default=10, help="runs per measurement")
+    args = parser.parse_args()
+    if os.name == "nt":
+        print("The hand-off benchmark needs Unix domain sockets.")
+        return 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+                   XDG_RUNTIME_DIR=directory, XDG_DATA_HOME=os.path.join(directory, "data"))
+        # The client reads its socket address from the environment
+        os.environ["XDG_RUNTIME_DIR"] = directory
+        from ursus.instance import server_address, forward_files
+
+        path = os.path.join(directory, "handoff.md")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("# Hand-off\n\nSome *text*.\n")
+
+        cold = [time_command([sys.executable, "-c", COLD_START, path], env) for _ in range(args.runs)]
+
+        server = subprocess.Popen([sys.executable, "-m", "ursus"], env=env, cwd=ROOT)
+        try:
+            wait_for_server(server_address(), server)
+            handoff = [time_command([sys.executable, "-m", "ursus", path], env) for _ in range(args.runs)]
+            in_process = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                if not forward_files([path]):
+                    raise RuntimeError("the running editor did not accept the file")
+                in_process.append((time.perf_counter() - start) * 1000)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'cold start':<28} {statistics.median(cold):10.1f}ms")
+    print(f"{'hand-off (ursus FILE)':<28} {statistics.median(handoff):10.1f}ms")
+    print(f"{'hand-off (socket only)':<28} {statistics.median(in_process):10.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
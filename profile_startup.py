@@ -1,89 +1,131 @@
 #!/usr/bin/env python3
-"""Profiling script to measure application startup performance."""
+"""Repeatable startup measurements.
 
-import cProfile
-import pstats
-import time
-import sys
+Starts the editor in a fresh interpreter for every run and reports the
+median, minimum and maximum of each startup phase:
+
+    python profile_startup.py --runs 20 --output startup.json
+    python profile_startup.py --cprofile startup_profile.prof
+
+Phases: interpreter start-up and shutdown, importing the editor,
+constructing QApplication and MainWindow, and showing the window until its
+editor has painted for the first time. Total is the wall time of the run.
+"""
+
+import argparse
+import json
 import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
 
-# Add the ursus package to path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Runs in a fresh interpreter and prints its phase timings as JSON
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from PySide6.QtCore import QObject, QEvent
+from PySide6.QtWidgets import QApplication
+from ursus.main_window import MainWindow
+imported = time.perf_counter()
+app = QApplication(sys.argv)
+window = MainWindow(text_size=20)
+constructed = time.perf_counter()
 
-def profile_startup():
-    """Profile the application startup."""
-    print("Profiling application startup...")
-    
-    # Profile with cProfile
+class FirstPaint(QObject):
+    painted = None
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.painted is None:
+            self.painted = time.perf_counter()
+        return False
+
+first_paint = FirstPaint()
+window.main_widget.viewport().installEventFilter(first_paint)
+window.show()
+while first_paint.painted is None:
+    app.processEvents()
+window.close()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "construct": (constructed - imported) * 1000,
+    "first_paint": (first_paint.painted - constructed) * 1000,
+}))
+"""
+PHASES = ("interpreter", "import", "construct", "first_paint", "total")
+
+
+def run_once(env):
+    """Start the editor in a new interpreter and return its phase timings in ms."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    wall = (time.perf_counter() - start) * 1000
+    timings = json.loads(output.strip().splitlines()[-1])
+    in_child = timings["import"] + timings["construct"] + timings["first_paint"]
+    # Interpreter start-up and shutdown around the measured phases
+    timings["interpreter"] = max(0.0, wall - in_child)
+    timings["total"] = wall
+    return timings
+
+
+def profile_in_process(path):
+    """Profile one startup with cProfile and print the hottest functions."""
+    import cProfile
+    import pstats
+
+    sys.path.insert(0, ROOT)
     profiler = cProfile.Profile()
     profiler.enable()
-    
-    start_time = time.time()
-    
-    # Import and initialize the application
-    from ursus.main_window import MainWindow
     from PySide6.QtWidgets import QApplication
-    
-    app = QApplication(sys.argv)
+    from ursus.main_window import MainWindow
+    app = QApplication.instance() or QApplication(sys.argv)
     window = MainWindow(text_size=20)
-    
-    init_time = time.time()
-    
-    # Show window (this triggers final UI setup)
     window.show()
-    
-    show_time = time.time()
-    
+    app.processEvents()
     profiler.disable()
-    
-    # Print timing results
-    print(f"\nTiming Results:")
-    print(f"Import + Init: {(init_time - start_time)*1000:.2f}ms")
-    print(f"Show window: {(show_time - init_time)*1000:.2f}ms")
-    print(f"Total startup: {(show_time - start_time)*1000:.2f}ms")
-    
-    # Save profiling results
-    profiler.dump_stats('startup_profile.prof')
-    
-    # Print top functions by cumulative time
+    window.close()
+
+    profiler.dump_stats(path)
     stats = pstats.Stats(profiler)
     print("\nTop 20 functions by cumulative time:")
     stats.sort_stats('cumulative').print_stats(20)
-    
     print("\nTop 20 functions by self time:")
     stats.sort_stats('tottime').print_stats(20)
-    
-    # Close the app
-    app.quit()
-
-def simple_timing_test():
-    """Simple timing test without QApplication conflicts."""
-    print("\nSimple timing test...")
-    
-    # Time just the import and initialization
-    start = time.time()
-    
-    from ursus.main_window import MainWindow
-    from PySide6.QtWidgets import QApplication
-    
-    init_time = time.time()
-    print(f"Import time: {(init_time - start)*1000:.2f}ms")
-    
-    # Create app and window
-    app = QApplication.instance() or QApplication(sys.argv)
-    window = MainWindow(text_size=20)
-    
-    create_time = time.time()
-    print(f"Window creation: {(create_time - init_time)*1000:.2f}ms")
-    
-    window.show()
-    
-    show_time = time.time()
-    print(f"Show window: {(show_time - create_time)*1000:.2f}ms")
-    print(f"Total optimized startup: {(show_time - start)*1000:.2f}ms")
-    
-    return show_time - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure editor startup over many runs.")
+    parser.add_argument("--runs", type=int, default=10, help="number of fresh-interpreter runs")
+    parser.add_argument("--output", help="write every run and the summary to this JSON file")
+    parser.add_argument("--offscreen", action="store_true", help="run without a display")
+    parser.add_argument("--cprofile", metavar="PATH", help="also profile one in-process startup to PATH")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    summary = {}
+    print(f"{'phase':<14}{'median':>10}{'min':>10}{'max':>10}")
+    for phase in PHASES:
+        values = [run[phase] for run in runs]
+        summary[phase] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+        print(f"{phase:<14}{summary[phase]['median']:>8.1f}ms{min(values):>8.1f}ms{max(values):>8.1f}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"runs": runs, "summary": summary}, file, indent=2)
+
+    if args.cprofile:
+        if args.offscreen:
+            os.environ["QT_QPA_PLATFORM"] = "offscreen"
+        profile_in_process(args.cprofile)
+    return 0
+
 
 if __name__ == "__main__":
-    profile_startup()
-    simple_timing_test()
\ No newline at end of file
+    sys.exit(main())
@@ -5,7 +5,8 @@ setup(
     version="0.1.0",
     packages=find_packages(),
     install_requires=[
-        "PySide6",
+        # 6.12.0 drops a reference to None on every QSyntaxHighlighter.setFormat call
+        "PySide6>=6.9,!=6.12.0",
         "mistune",
         "klembord"
     ],
@@ -15,7 +16,7 @@ setup(
         ]
     },
     include_package_data=True,
-    package_data={"": ["resources/*.ttf", "resources/*.png"]},
+    package_data={"ursus.resources": ["*.ttf", "*.png"]},
     author="Claude Henchoz",
     author_email="claude.henchoz@gmail.com",
     description="A *very* minimalist markdown editor",
@@ -1,15 +1,50 @@
+import argparse
 import sys
-from PySide6.QtWidgets import QApplication
 from .config import Config
-from .main_window import MainWindow
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "convert":
+        # Headless batch mode; keep PySide6 out of the process entirely
+        from .convert import main as convert_main
+        sys.exit(convert_main(argv[1:]))
+
+    parser = argparse.ArgumentParser(prog="ursus")
+    parser.add_argument("files", nargs="*", help="files to open")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a new editor instead of handing the files to a running one")
+    parser.add_argument("--profile", metavar="PATH", help="write timing statistics as JSON to PATH on exit")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace of timed calls to PATH on exit")
+    parser.add_argument("--editor", choices=["auto", "rich", "plain"],
+                        help="editor widget: QTextEdit (rich), QPlainTextEdit (plain) or chosen by file size")
+    args, _ = parser.parse_known_args(argv)
+    if not args.new_instance:
+        # Hand the files to a running editor before anything expensive is imported
+        from .instance import forward_files
+        if forward_files(args.files):
+            sys.exit(0)
+
+    # Must run before the editor classes are instantiated
+    from . import instrumentation
+    instrumentation.enable(args.profile, args.trace)
+
+    from PySide6.QtWidgets import QApplication
+    from .journal import find_unclean_sessions
+    from .instance_server import InstanceServer
+
     app = QApplication(["Marky"])
     app.setApplicationName(Config.application_name)
     app.setOrganizationName(Config.organization_name)
     app.setOrganizationDomain(Config.domain)
-    main_window = MainWindow(text_size=20)
-    main_window.show()
+    instance_server = InstanceServer(text_size=20, editor_mode=args.editor)
+    if not args.new_instance:
+        instance_server.listen()
+        app.aboutToQuit.connect(instance_server.close)
+    main_window = instance_server.new_window()
+    # Every tab of a crashed editor leaves its own session behind
+    for session_dir in find_unclean_sessions():
+        main_window.recover_session(session_dir)
+    instance_server.open_files(args.files)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
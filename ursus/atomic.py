@@ -0,0 +1,30 @@
+"""Crash-safe file writes. Kept free of Qt so headless tools can use it."""
+
+import os
+import shutil
+import tempfile
+
+
+def write_atomic(file_path, text, chunk_size=1 << 20):
+    """Write text to a temp file next to file_path, fsync it and replace file_path."""
+    # Write next to the target so os.replace stays on one filesystem
+    directory = os.path.dirname(os.path.abspath(file_path))
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".ursus-", suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            # Encode piecewise so the text is never held twice in memory
+            for start in range(0, len(text), chunk_size):
+                file.write(text[start:start + chunk_size].encode("utf-8"))
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except OSError:
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        raise
@@ -0,0 +1,396 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout
+from PySide6.QtCore import QObject
+import os
+import time
+
+from .config import Config
+from .file_io import FileLoader, FileSaver, FileDiffer, file_signature
+from .html_export import HtmlCache, HtmlRenderer
+from .journal import RecoveryJournal, replay_session, remove_session
+from .main_widget import MainWidget, PlainTextMainWidget
+
+
+class Buffer(QObject):
+    """One document open in a window tab, with its loads, saves and recovery journal.
+
+    The editor is only created, and the file only read, when the tab is first
+    shown. An unmodified buffer can be evicted to free its editor; it is read
+    from disk again when shown.
+    """
+
+    def __init__(self, main_window, file_path=None):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.file_path = file_path
+        # Tab page that holds the editor while there is one
+        self.page = QWidget()
+        self.page_layout = QVBoxLayout(self.page)
+        self.page_layout.setContentsMargins(0, 0, 0, 0)
+        self.last_shown = 0.0
+        # Set by close; queued signals of its threads may still arrive afterwards
+        self.closed = False
+
+        self.editor = None
+        self.journal = None
+        self.file_loader = None
+        self.file_saver = None
+        self.pending_save_path = None
+
+        # Reloading the file when another program changes it
+        self.watched_path = None
+        self.disk_signature = None  # file_signature when the file was last loaded or saved
+        self.file_differ = None
+        self.disk_check_pending = False
+
+        self.html_cache = None
+        self.html_renderer = None
+        self.html_copy_pending = False
+        self.rendered_html = None  # (markdown, html) of the unchanged document
+        self.document_revision = 0
+
+    def name(self):
+        return os.path.basename(self.file_path) if self.file_path else "Untitled"
+
+    def title(self):
+        return f"{self.name()}*" if self.is_modified() else self.name()
+
+    def is_modified(self):
+        return self.editor is not None and self.editor.document().isModified()
+
+    def is_blank(self):
+        """Return True if the buffer shows no file and has no text."""
+        return (self.file_loader is None and self.file_path is None
+                and (self.editor is None or self.editor.document().isEmpty()))
+
+    def memory_estimate(self):
+        """Approximate bytes held by the buffer's text, which is UTF-16 in Qt."""
+        if self.editor is None:
+            return 0
+        return self.editor.document().characterCount() * 2
+
+    def can_evict(self):
+        return (self.editor is not None and self.file_path is not None and not self.is_modified()
+                and self.file_loader is None and self.file_saver is None and self.file_differ is None
+                and self.html_renderer is None)
+
+    def ensure_editor(self):
+        """Create the editor on first use, reading the buffer's file into it."""
+        if self.editor is not None:
+            return self.editor
+        editor_class = PlainTextMainWidget if self.main_window.editor_mode == "plain" else MainWidget
+        self.set_editor(editor_class(self.main_window.text_size))
+        self.journal = RecoveryJournal(self.editor.document(), self)
+        self.html_cache = HtmlCache()
+        self.document_revision = 0
+        if self.file_path is not None:
+            self.load_file(self.file_path)
+        return self.editor
+
+    def set_editor(self, editor):
+        """Show editor in the buffer's tab, replacing any previous one."""
+        if self.editor is not None:
+            self.page_layout.removeWidget(self.editor)
+            self.editor.deleteLater()
+        self.editor = editor
+        if self.main_window.colors is not None:
+            editor.change_colors(*self.main_window.colors)
+        self.page_layout.addWidget(editor)
+        document = editor.document()
+        document.contentsChange.connect(self.on_document_changed)
+        document.modificationChanged.connect(lambda: self.main_window.update_tab_title(self))
+        if self.journal is not None:
+            self.journal.set_document(document)
+        self.rendered_html = None
+        self.main_window.on_editor_replaced(self)
+
+    def use_editor_class(self, editor_class):
+        """Replace the editor widget with one of editor_class, keeping its colors."""
+        if type(self.editor) is not editor_class:
+            self.set_editor(editor_class(self.main_window.text_size))
+
+    def evict(self):
+        """Drop the editor of an unmodified buffer until it is shown again."""
+        if not self.can_evict():
+            return False
+        self.journal.close()
+        self.journal = None
+        self.page_layout.removeWidget(self.editor)
+        self.editor.deleteLater()
+        self.editor = None
+        self.html_cache = None
+        self.rendered_html = None
+        self.update_watch()
+        return True
+
+    def close(self, discard=False):
+        """Stop the buffer's threads and drop its editor. Unsaved text stays in the
+        recovery journal, to be restored on the next start, unless discard is set."""
+        self.cancel_load()
+        self.wait_for_save()
+        self.closed = True
+        if self.file_differ is not None:
+            self.file_differ.wait()
+        if self.watched_path is not None:
+            self.main_window.file_watcher.unwatch(self.watched_path, self)
+            self.watched_path = None
+        if self.journal is not None:
+            self.journal.close(keep=not discard and self.is_modified() and not self.is_blank())
+        if self.html_renderer is not None:
+            self.html_renderer.wait()
+        self.page.deleteLater()
+
+    def recover_session(self, session_dir):
+        """Restore the unsaved text of an editor that did not shut down cleanly."""
+        self.ensure_editor()
+        self.journal.pause()
+        try:
+            with self.editor.edit_transaction():
+                self.file_path = replay_session(session_dir, self.editor.document())
+        except (OSError, ValueError) as e:
+            self.file_path = None
+            self.editor.load_text("")
+            self.journal.reset()
+            self.main_window.show_error_message(f"Could not recover unsaved changes from {session_dir}: {e}")
+            return False
+        # The recovered text exists nowhere else yet, so start from a snapshot of it
+        self.journal.reset(self.file_path, base="snapshot")
+        remove_session(session_dir)
+        if self.file_path is not None:
+            self.disk_signature = file_signature(self.file_path)
+        self.update_watch()
+        self.main_window.update_tab_title(self)
+        return True
+
+    def load_file(self, file_path):
+        """Stream a file into the editor from a worker thread."""
+        self.cancel_load()
+        self.file_path = file_path
+        if self.editor is None:
+            # Loads the file once the editor exists
+            self.ensure_editor()
+            return
+        self.file_loader = FileLoader(file_path, self)
+        self.file_loader.chunk_loaded.connect(self.on_chunk_loaded)
+        self.file_loader.progress.connect(self.on_load_progress)
+        self.file_loader.failed.connect(self.on_load_failed)
+        self.file_loader.finished.connect(self.on_load_finished)
+        self.journal.pause()
+        # Taken before reading, so a change during the load is reloaded afterwards
+        self.disk_signature = file_signature(file_path)
+        self.update_watch()
+        if self.main_window.editor_mode == "auto":
+            try:
+                large = os.path.getsize(file_path) > Config.plain_text_threshold
+            except OSError:
+                large = False  # The loader reports the error
+            self.use_editor_class(PlainTextMainWidget if large else MainWidget)
+        self.editor.begin_streaming()
+        self.main_window.update_tab_title(self)
+        self.main_window.update_load_progress(self, 0)
+        self.main_window.statusBar().showMessage(f"Loading {file_path}... (Esc to cancel)")
+        self.file_loader.start()
+
+    def cancel_load(self):
+        if self.file_loader is None:
+            return
+        self.file_loader.cancel()
+        self.discard_load()
+        self.main_window.statusBar().showMessage("Loading cancelled", 3000)
+
+    def discard_load(self):
+        self.file_loader = None
+        self.main_window.update_load_progress(self)
+        # A partially loaded file must never be saved over the original
+        self.editor.abort_streaming()
+        self.file_path = None
+        self.journal.reset()
+        self.update_watch()
+        self.main_window.update_tab_title(self)
+
+    def on_chunk_loaded(self, text):
+        if self.sender() is not self.file_loader:
+            return
+        self.editor.append_text(text)
+        self.file_loader.chunk_consumed()
+
+    def on_load_progress(self, value):
+        if self.sender() is self.file_loader:
+            self.main_window.update_load_progress(self, value)
+
+    def on_load_failed(self, message):
+        if self.sender() is not self.file_loader:
+            return
+        self.discard_load()
+        self.main_window.statusBar().clearMessage()
+        self.main_window.show_error_message(message)
+
+    def on_load_finished(self):
+        loader = self.sender()
+        loader.deleteLater()
+        if loader is not self.file_loader:
+            return
+        self.file_loader = None
+        self.main_window.update_load_progress(self)
+        self.editor.end_streaming()
+        self.editor.document().setModified(False)
+        self.file_path = loader.file_path
+        self.journal.reset(loader.file_path, base="file")
+        self.main_window.statusBar().clearMessage()
+        self.main_window.update_tab_title(self)
+        # Now that its size is known, other buffers may have to make room
+        self.main_window.evict_buffers()
+        if self.disk_check_pending:
+            self.check_disk()
+
+    def save(self, file_path):
+        if self.file_saver is not None:
+            # Coalesce: the text is captured once the write in flight has finished
+            self.pending_save_path = file_path
+            return
+        self.save_started = time.perf_counter()
+        self.save_journal_state = (self.journal.generation, self.journal.delta_count)
+        self.file_saver = FileSaver(file_path, self.editor.toPlainText(), self)
+        self.file_saver.saved.connect(self.on_file_saved)
+        self.file_saver.failed.connect(self.main_window.show_error_message)
+        self.file_saver.finished.connect(self.on_save_finished)
+        self.file_path = file_path
+        self.file_saver.start()
+
+    def on_file_saved(self, file_path):
+        if self.closed:
+            return
+        elapsed = (time.perf_counter() - self.save_started) * 1000
+        # Our own write is not an outside change to reload
+        self.disk_signature = file_signature(file_path)
+        self.update_watch()
+        self.main_window.statusBar().showMessage(f"Saved {file_path} in {elapsed:.0f} ms", 3000)
+        if (self.journal.generation, self.journal.delta_count) == self.save_journal_state:
+            # The saved file holds every edit, so the journal can start over from it
+            self.journal.reset(file_path, base="file")
+            self.editor.document().setModified(False)
+        else:
+            # Edits made during the save are not in the file, which no longer matches the old base
+            self.journal.file_path = file_path
+            self.journal.compact()
+        self.main_window.update_tab_title(self)
+
+    def on_save_finished(self):
+        # Also called directly by wait_for_save, before the queued signal arrives
+        if self.closed or self.file_saver is None or self.file_saver.isRunning():
+            return
+        self.file_saver.deleteLater()
+        self.file_saver = None
+        if self.pending_save_path is not None:
+            file_path, self.pending_save_path = self.pending_save_path, None
+            self.save(file_path)
+        elif self.disk_check_pending:
+            self.check_disk()
+
+    def wait_for_save(self):
+        """Block until in-flight and coalesced saves have been written."""
+        while self.file_saver is not None:
+            self.file_saver.wait()
+            self.on_save_finished()
+
+    def update_watch(self):
+        """Watch the buffer's file for changes by other programs while it has an editor."""
+        file_path = self.file_path if self.editor is not None else None
+        if file_path == self.watched_path:
+            return
+        if self.watched_path is not None:
+            self.main_window.file_watcher.unwatch(self.watched_path, self)
+        if file_path is not None:
+            self.main_window.file_watcher.watch(file_path, self)
+        self.watched_path = file_path
+
+    def on_disk_changed(self):
+        """Called by the window's FileWatcher once changes to the file have settled."""
+        if self.file_loader is not None or self.file_saver is not None or self.file_differ is not None:
+            # Checked again when they have finished
+            self.disk_check_pending = True
+            return
+        self.check_disk()
+
+    def check_disk(self):
+        """Reload the file in place if another program changed it since it was loaded or saved."""
+        self.disk_check_pending = False
+        if self.editor is None or self.file_path is None:
+            return
+        signature = file_signature(self.file_path)
+        if signature is None or signature == self.disk_signature:
+            return
+        name = os.path.basename(self.file_path)
+        if self.is_modified():
+            # Unsaved edits are kept; saving them overwrites the file
+            self.disk_signature = signature
+            self.main_window.statusBar().showMessage(f"{name} changed on disk; keeping your unsaved changes", 5000)
+            return
+        self.diff_revision = self.document_revision
+        self.file_differ = FileDiffer(self.file_path, self.editor.toPlainText(), self)
+        self.file_differ.diffed.connect(self.on_file_diffed)
+        self.file_differ.failed.connect(self.on_diff_failed)
+        self.file_differ.finished.connect(self.on_diff_finished)
+        self.file_differ.start()
+
+    def on_file_diffed(self, changes):
+        differ = self.sender()
+        if self.closed:
+            return
+        if self.document_revision != self.diff_revision:
+            # Edited while diffing, so the changes no longer fit the text
+            self.disk_check_pending = True
+            return
+        self.disk_signature = differ.signature
+        if not changes:
+            return
+        self.journal.pause()
+        self.editor.apply_changes(changes)
+        self.editor.document().setModified(False)
+        self.journal.reset(self.file_path, base="file")
+        self.main_window.update_tab_title(self)
+        self.main_window.statusBar().showMessage(f"Reloaded {os.path.basename(self.file_path)}", 3000)
+
+    def on_diff_failed(self, message):
+        self.main_window.statusBar().showMessage(f"Could not reload {self.file_path}: {message}", 5000)
+
+    def on_diff_finished(self):
+        if self.closed:
+            return
+        self.file_differ.deleteLater()
+        self.file_differ = None
+        if self.disk_check_pending:
+            self.check_disk()
+
+    def on_document_changed(self, position, chars_removed, chars_added):
+        self.document_revision += 1
+        self.rendered_html = None
+
+    def copy_as_html(self):
+        if self.rendered_html is not None:
+            self.main_window.set_clipboard_html(*self.rendered_html)
+            return
+        if self.html_renderer is not None:
+            # Render again with the latest text once the current render is done
+            self.html_copy_pending = True
+            return
+        self.html_render_revision = self.document_revision
+        self.html_renderer = HtmlRenderer(self.editor.toPlainText(), self.html_cache, self)
+        self.html_renderer.rendered.connect(self.on_html_rendered)
+        self.html_renderer.finished.connect(self.on_html_render_finished)
+        self.html_renderer.start()
+
+    def on_html_rendered(self, markdown_text, html_text):
+        if self.closed or self.html_copy_pending:
+            return
+        if self.html_render_revision == self.document_revision:
+            self.rendered_html = (markdown_text, html_text)
+        self.main_window.set_clipboard_html(markdown_text, html_text)
+
+    def on_html_render_finished(self):
+        if self.closed:
+            return
+        self.html_renderer.deleteLater()
+        self.html_renderer = None
+        if self.html_copy_pending:
+            self.html_copy_pending = False
+            self.copy_as_html()
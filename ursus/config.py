@@ -3,3 +3,32 @@ class Config:
     organization_name = "Claude Henchoz"
     application_name = "Ursus"
     domain = "henchoz.net"
+
+    # Documents with more characters than this are highlighted progressively
+    progressive_highlight_threshold = 500_000
+    # Milliseconds of background highlighting per event loop tick, after which the
+    # blocks highlighted in it are laid out again at once
+    highlight_budget_ms = 5
+
+    # "rich" (QTextEdit), "plain" (QPlainTextEdit) or "auto" to pick by file size
+    editor_mode = "auto"
+    # In auto mode, files larger than this many bytes open in the plain text editor
+    plain_text_threshold = 5_000_000
+
+    # Milliseconds between writes of buffered edits to the recovery journal
+    autosave_interval_ms = 2000
+    # Journal size (bytes) after which it is compacted into a snapshot
+    journal_compact_bytes = 4 << 20
+
+    # Bytes of text (estimated as UTF-16) kept in editors across a window's tabs;
+    # above this, unmodified background tabs drop their editor until shown again
+    buffer_memory_budget = 64 << 20
+
+    # Default color theme, one of theme.THEMES; the chosen theme and text size are saved
+    theme = "light"
+    # Range of text sizes (points) reachable by zooming
+    min_text_size = 6
+    max_text_size = 72
+
+    # Milliseconds without further changes to an open file before it is reloaded
+    file_watch_debounce_ms = 300
@@ -0,0 +1,124 @@
+"""Headless markdown to HTML conversion (`ursus convert`). Must not import PySide6."""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from .atomic import write_atomic
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+MANIFEST_NAME = ".ursus-manifest.json"
+
+
+def collect_sources(paths, output_dir):
+    """Return (source, output) path pairs for the given files and directory trees."""
+    pairs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                        source = os.path.join(root, name)
+                        pairs.append((source, output_path(source, output_dir)))
+        else:
+            pairs.append((path, output_path(path, output_dir)))
+    return pairs
+
+
+def output_path(source, output_dir):
+    """Return where the HTML of source goes: next to it, or at its path relative to
+    the working directory under output_dir, so same-named sources never collide."""
+    if not output_dir:
+        return os.path.splitext(source)[0] + ".html"
+    source = os.path.abspath(source)
+    try:
+        relative = os.path.relpath(source)
+    except ValueError:
+        relative = os.pardir  # On another drive
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        # Outside the working directory, so its absolute path is mirrored instead
+        relative = os.path.splitdrive(source)[1].lstrip(os.sep)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".html")
+
+
+def manifest_path(output, output_dir):
+    """Return the manifest tracking output: the one in output_dir, or the one in
+    the directory output is written to next to its source."""
+    directory = output_dir or os.path.dirname(os.path.abspath(output))
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def convert_file(source, output, known_digest):
+    """Convert one file unless its content hash matches known_digest.
+
+    Runs in a worker process; returns (source, digest, converted).
+    """
+    with open(source, "rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_digest and os.path.exists(output):
+        return source, digest, False
+
+    import mistune
+    html = mistune.markdown(data.decode("utf-8"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    write_atomic(output, html)
+    return source, digest, True
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ursus convert", description="Convert markdown files to HTML.")
+    parser.add_argument("paths", nargs="+", help="markdown files or directories to convert recursively")
+    parser.add_argument("-o", "--output-dir", help="write HTML here instead of next to each source")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="convert files even if they are unchanged")
+    args = parser.parse_args(argv)
+
+    pairs = collect_sources(args.paths, args.output_dir)
+    # Source -> manifest path, and manifest path -> {absolute source path: digest}
+    manifest_paths = {source: manifest_path(output, args.output_dir) for source, output in pairs}
+    manifests = {path: load_manifest(path) for path in set(manifest_paths.values())}
+
+    converted = skipped = failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {}
+            for source, output in pairs:
+                manifest = manifests[manifest_paths[source]]
+                known_digest = None if args.force else manifest.get(os.path.abspath(source))
+                futures[executor.submit(convert_file, source, output, known_digest)] = source
+            # Report each file as soon as its worker is done
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    _, digest, was_converted = future.result()
+                except Exception as e:
+                    # A file mistune or the worker chokes on must not stop the others
+                    print(f"error: {source}: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                manifests[manifest_paths[source]][os.path.abspath(source)] = digest
+                if was_converted:
+                    print(f"converted: {source}")
+                    converted += 1
+                else:
+                    skipped += 1
+    finally:
+        for path, manifest in manifests.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, json.dumps(manifest, indent=1, sort_keys=True))
+
+    print(f"{converted} converted, {skipped} unchanged, {failed} failed")
+    return 1 if failed else 0
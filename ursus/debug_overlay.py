@@ -0,0 +1,44 @@
+from PySide6.QtWidgets import QLabel
+from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, QTimer
+
+from . import instrumentation
+
+
+class DebugOverlay(QLabel):
+    """Live view of instrumentation counters, drawn over the editor."""
+
+    REFRESH_INTERVAL = 500
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        font = QFont("monospace", 9)
+        font.setStyleHint(QFont.Monospace)
+        self.setFont(font)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 180); color: white; padding: 6px;")
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def toggle(self):
+        if self.isVisible():
+            self.refresh_timer.stop()
+            self.hide()
+        else:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.refresh_timer.start(self.REFRESH_INTERVAL)
+
+    def refresh(self):
+        lines = [f"{'name':<26}{'count':>9}{'mean':>11}{'total':>12}"]
+        for name, stats in instrumentation.summary().items():
+            unit = "ms" if "mean_ms" in stats else ""
+            mean = stats.get("mean_ms", stats.get("mean_value"))
+            total = stats.get("total_ms", stats.get("total_value"))
+            lines.append(f"{name:<26}{stats['count']:>9}{mean:>9.3f}{unit:<2}{total:>10.1f}{unit:<2}")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(self.parentWidget().width() - self.width() - 10, 10)
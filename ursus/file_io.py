@@ -0,0 +1,155 @@
+from PySide6.QtCore import QThread, Signal
+from difflib import SequenceMatcher
+import codecs
+import io
+import os
+import threading
+
+from .atomic import write_atomic
+from .search import document_length
+
+
+def file_signature(file_path):
+    """Return (mtime_ns, size) of a file, or None if it cannot be read."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def split_lines(text):
+    """Split text into lines that keep their newline, so they join back into text."""
+    lines = text.split("\n")
+    return [line + "\n" for line in lines[:-1]] + lines[-1:]
+
+
+def line_changes(old_text, new_text):
+    """Return the changes that turn old_text into new_text, line by line.
+
+    Each change is (start, end, text, length): the document positions of the
+    old lines it replaces, the new lines, and their length in document positions.
+    """
+    old_lines = split_lines(old_text)
+    new_lines = split_lines(new_text)
+    # Most reloads change a few lines, so only the part between the common ends is diffed
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+
+    changes = []
+    position = sum(document_length(line) for line in old_lines[:prefix])
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_middle, new_middle).get_opcodes():
+        old_length = sum(document_length(line) for line in old_middle[i1:i2])
+        if tag != "equal":
+            text = "".join(new_middle[j1:j2])
+            changes.append((position, position + old_length, text, document_length(text)))
+        position += old_length
+    return changes
+
+
+class FileLoader(QThread):
+    """Reads a file on a worker thread and streams decoded text in chunks."""
+
+    chunk_loaded = Signal(str)
+    progress = Signal(int)  # Percentage of the file read so far
+    failed = Signal(str)
+
+    CHUNK_SIZE = 1 << 20
+    # Chunks handed to the GUI thread but not yet appended to the document
+    MAX_PENDING_CHUNKS = 4
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.cancelled = False
+        self.pending_chunks = threading.Semaphore(self.MAX_PENDING_CHUNKS)
+
+    def cancel(self):
+        self.cancelled = True
+        # Wake the worker if it is waiting for the GUI to catch up
+        self.pending_chunks.release()
+
+    def chunk_consumed(self):
+        """Called once the GUI thread has appended a chunk."""
+        self.pending_chunks.release()
+
+    def run(self):
+        # Same newline handling as text mode, but one chunk of text in memory at a time
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+        try:
+            total = os.path.getsize(self.file_path)
+            bytes_read = 0
+            with open(self.file_path, "rb") as file:
+                while not self.cancelled:
+                    data = file.read(self.CHUNK_SIZE)
+                    bytes_read += len(data)
+                    text = decoder.decode(data, final=not data)
+                    if text:
+                        self.pending_chunks.acquire()
+                        if self.cancelled:
+                            break
+                        self.chunk_loaded.emit(text)
+                    self.progress.emit(int(bytes_read * 100 / total) if total else 100)
+                    if not data:
+                        break
+        except (OSError, UnicodeDecodeError) as e:
+            self.failed.emit(str(e))
+
+
+class FileSaver(QThread):
+    """Writes a text snapshot atomically on a worker thread."""
+
+    saved = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, file_path, text, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.text = text
+
+    def run(self):
+        try:
+            write_atomic(self.file_path, self.text)
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        finally:
+            self.text = None
+        self.saved.emit(self.file_path)
+
+
+
+class FileDiffer(QThread):
+    """Reads a file on a worker thread and diffs it against a snapshot of the
+    document, emitting the changes that turn the document into the file."""
+
+    diffed = Signal(list)
+    failed = Signal(str)
+
+    def __init__(self, file_path, text, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.text = text
+        # file_signature of the file as it was read
+        self.signature = None
+
+    def run(self):
+        try:
+            # Same newline handling as FileLoader
+            with open(self.file_path, encoding="utf-8") as file:
+                stat = os.fstat(file.fileno())
+                self.signature = (stat.st_mtime_ns, stat.st_size)
+                file_text = file.read()
+        except (OSError, UnicodeDecodeError) as e:
+            self.failed.emit(str(e))
+            return
+        finally:
+            text, self.text = self.text, None
+        self.diffed.emit(line_changes(text, file_text))
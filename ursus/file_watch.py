@@ -0,0 +1,77 @@
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer
+import os
+
+from .config import Config
+
+
+class FileWatcher(QObject):
+    """Watches the files of a window's buffers and tells the buffers about
+    changes on disk once a burst of them has settled."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        # A file replaced by a rename (atomic saves, git checkouts) is no longer
+        # watched, so its directory is watched too to pick it up again
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.buffers = {}  # File path -> buffers showing the file
+        self.changed_paths = set()
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(Config.file_watch_debounce_ms)
+        self.debounce_timer.timeout.connect(self.notify)
+
+    def watch(self, file_path, buffer):
+        file_path = os.path.abspath(file_path)
+        buffers = self.buffers.setdefault(file_path, [])
+        if buffer in buffers:
+            return
+        buffers.append(buffer)
+        if len(buffers) > 1:
+            return
+        if os.path.exists(file_path):
+            self.watcher.addPath(file_path)
+        directory = os.path.dirname(file_path)
+        if directory not in self.watcher.directories() and os.path.isdir(directory):
+            self.watcher.addPath(directory)
+
+    def unwatch(self, file_path, buffer):
+        file_path = os.path.abspath(file_path)
+        buffers = self.buffers.get(file_path)
+        if not buffers or buffer not in buffers:
+            return
+        buffers.remove(buffer)
+        if buffers:
+            return
+        del self.buffers[file_path]
+        self.changed_paths.discard(file_path)
+        if file_path in self.watcher.files():
+            self.watcher.removePath(file_path)
+        directory = os.path.dirname(file_path)
+        if (directory in self.watcher.directories()
+                and not any(os.path.dirname(path) == directory for path in self.buffers)):
+            self.watcher.removePath(directory)
+
+    def on_file_changed(self, file_path):
+        self.changed_paths.add(file_path)
+        # Restarting the timer waits for a burst of writes to end
+        self.debounce_timer.start()
+
+    def on_directory_changed(self, directory):
+        watched = set(self.watcher.files())
+        for file_path in self.buffers:
+            if os.path.dirname(file_path) == directory and file_path not in watched:
+                self.changed_paths.add(file_path)
+                self.debounce_timer.start()
+
+    def notify(self):
+        changed_paths, self.changed_paths = self.changed_paths, set()
+        watched = set(self.watcher.files())
+        for file_path in changed_paths:
+            if file_path not in self.buffers:
+                continue
+            if file_path not in watched and os.path.exists(file_path):
+                self.watcher.addPath(file_path)
+            for buffer in list(self.buffers[file_path]):
+                buffer.on_disk_changed()
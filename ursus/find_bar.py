@@ -0,0 +1,276 @@
+from PySide6.QtWidgets import QToolBar, QLineEdit, QLabel, QTextEdit
+from PySide6.QtGui import QTextCharFormat, QTextCursor, QColor, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QTimer
+from bisect import bisect_left, bisect_right
+
+from .search import SearchWorker, find_positions, document_length
+
+
+class FindBar(QToolBar):
+    """Incremental find and replace.
+
+    Searches run on a worker over a snapshot of the text. Extending the query
+    narrows the previous matches instead of scanning again, and only matches
+    in the viewport are drawn.
+    """
+
+    # Coalesce keystrokes in the find field into one search (ms)
+    SEARCH_DELAY = 100
+    # Upper bound on the extra selections drawn at once
+    MAX_SELECTIONS = 1000
+
+    def __init__(self, parent):
+        super().__init__("Find", parent)
+        self.setObjectName("FindBar")
+        self.setMovable(False)
+
+        self.find_field = QLineEdit()
+        self.find_field.setPlaceholderText("Find")
+        self.find_field.textChanged.connect(self.on_query_changed)
+        self.find_field.returnPressed.connect(self.find_next)
+        find_previous = QShortcut(QKeySequence("Shift+Return"), self.find_field)
+        find_previous.setContext(Qt.WidgetShortcut)
+        find_previous.activated.connect(self.find_previous)
+        self.addWidget(self.find_field)
+
+        self.case_action = self.addAction("Aa")
+        self.case_action.setCheckable(True)
+        self.case_action.setToolTip("Match case")
+        self.case_action.toggled.connect(self.on_query_changed)
+
+        self.replace_field = QLineEdit()
+        self.replace_field.setPlaceholderText("Replace")
+        self.replace_field.returnPressed.connect(self.replace_current)
+        self.addWidget(self.replace_field)
+        self.addAction("Replace", self.replace_current)
+        self.addAction("Replace All", self.replace_all)
+
+        self.count_label = QLabel()
+        self.addWidget(self.count_label)
+
+        self.match_format = QTextCharFormat()
+        self.match_format.setBackground(QColor("#ffd54f"))
+        self.match_format.setForeground(QColor("black"))
+
+        self.editor = None
+        self.worker = None
+        # Workers still running, including cancelled ones
+        self.workers = set()
+        # Sorted document positions of the query's occurrences in the snapshot
+        self.matches = []
+        self.match_length = 0
+        self.query = ""
+        self.case_sensitive = False
+        # Text the matches were found in; None once the document has been edited
+        self.snapshot = None
+        self.astral = None
+        self.complete = False
+        # Select the first match after this position as soon as it is found
+        self.jump_from = None
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.start_search)
+        self.hide()
+
+    def set_editor(self, editor):
+        """Search in editor, e.g. after the editor widget was replaced."""
+        if self.editor is not None:
+            self.editor.document().contentsChange.disconnect(self.on_document_changed)
+            self.editor.verticalScrollBar().valueChanged.disconnect(self.update_selections)
+        self.editor = editor
+        editor.document().contentsChange.connect(self.on_document_changed)
+        editor.verticalScrollBar().valueChanged.connect(self.update_selections)
+        self.snapshot = None
+        self.clear_matches()
+        if self.isVisible():
+            self.schedule_search()
+
+    def open(self, replace=False):
+        self.show()
+        cursor = self.editor.textCursor()
+        selected = cursor.selectedText()
+        if selected and "\u2029" not in selected:
+            self.find_field.setText(selected)
+        field = self.replace_field if replace else self.find_field
+        field.setFocus()
+        field.selectAll()
+        self.jump_from = cursor.selectionStart()
+        self.schedule_search()
+
+    def close_bar(self):
+        self.hide()
+        self.stop()
+        self.snapshot = None
+        self.clear_matches()
+        self.editor.setFocus()
+
+    def clear_matches(self):
+        self.matches = []
+        self.complete = False
+        self.count_label.clear()
+        self.editor.setExtraSelections([])
+
+    def cancel_search(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+    def stop(self):
+        """Stop pending and running searches, e.g. before the editor goes away."""
+        self.search_timer.stop()
+        self.cancel_search()
+        for worker in list(self.workers):
+            worker.wait()
+
+    def on_query_changed(self):
+        self.jump_from = self.editor.textCursor().selectionStart()
+        self.schedule_search()
+
+    def schedule_search(self):
+        self.search_timer.start(self.SEARCH_DELAY)
+
+    def on_document_changed(self, position, chars_removed, chars_added):
+        # Match positions are only valid for the snapshot they were found in
+        self.snapshot = None
+        if self.isVisible():
+            self.schedule_search()
+
+    def start_search(self):
+        self.cancel_search()
+        query = self.find_field.text()
+        case_sensitive = self.case_action.isChecked()
+        if not query:
+            self.query = ""
+            self.clear_matches()
+            return
+
+        candidates = None
+        if self.snapshot is None:
+            self.snapshot = self.editor.toPlainText()
+            self.astral = None
+        elif (self.complete and case_sensitive == self.case_sensitive
+                and self.query and query.startswith(self.query)):
+            # Every occurrence of the longer query starts at an occurrence of the shorter one
+            candidates = self.matches
+
+        self.query = query
+        self.case_sensitive = case_sensitive
+        self.match_length = document_length(query)
+        self.matches = []
+        self.complete = False
+        self.editor.setExtraSelections([])
+        self.worker = SearchWorker(self.snapshot, query, case_sensitive, candidates, self.astral, self)
+        self.worker.matches_found.connect(self.on_matches_found)
+        self.worker.finished.connect(self.on_search_finished)
+        self.workers.add(self.worker)
+        self.worker.start()
+
+    def on_matches_found(self, batch):
+        if self.sender() is not self.worker:
+            return
+        self.matches.extend(batch)
+        self.count_label.setText(f"{len(self.matches)} matches...")
+        if self.jump_from is not None and batch[-1] >= self.jump_from:
+            self.select_match(bisect_left(self.matches, self.jump_from))
+        self.update_selections()
+
+    def on_search_finished(self):
+        worker = self.sender()
+        worker.deleteLater()
+        self.workers.discard(worker)
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.astral = worker.astral
+        self.complete = True
+        self.count_label.setText(f"{len(self.matches)} matches")
+        if self.jump_from is not None and self.matches:
+            # Nothing after the cursor, so wrap around to the first match
+            self.select_match(0)
+        self.jump_from = None
+
+    def update_selections(self):
+        """Draw the matches within the viewport as extra selections."""
+        if not self.isVisible() or not self.matches:
+            return
+        first, last = self.editor.visible_position_range()
+        start = bisect_left(self.matches, first - self.match_length)
+        end = min(bisect_right(self.matches, last), start + self.MAX_SELECTIONS)
+        document = self.editor.document()
+        selections = []
+        for position in self.matches[start:end]:
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(document)
+            selection.cursor.setPosition(position)
+            selection.cursor.setPosition(position + self.match_length, QTextCursor.KeepAnchor)
+            selection.format = self.match_format
+            selections.append(selection)
+        self.editor.setExtraSelections(selections)
+
+    def select_match(self, index):
+        self.jump_from = None
+        position = self.matches[index % len(self.matches)]
+        cursor = self.editor.textCursor()
+        cursor.setPosition(position)
+        cursor.setPosition(position + self.match_length, QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+
+    def current_match_selected(self):
+        cursor = self.editor.textCursor()
+        start = cursor.selectionStart()
+        index = bisect_left(self.matches, start)
+        return (index < len(self.matches) and self.matches[index] == start
+                and cursor.selectionEnd() - start == self.match_length)
+
+    def find_next(self):
+        if self.snapshot is None or self.worker is not None or self.search_timer.isActive():
+            # Jump once the up-to-date matches arrive
+            self.jump_from = self.editor.textCursor().selectionEnd()
+            if self.worker is None:
+                self.search_timer.stop()
+                self.start_search()
+        elif self.matches:
+            self.select_match(bisect_right(self.matches, self.editor.textCursor().selectionStart()))
+
+    def find_previous(self):
+        if self.matches and self.snapshot is not None:
+            self.select_match(bisect_left(self.matches, self.editor.textCursor().selectionStart()) - 1)
+
+    def replace_current(self):
+        if self.snapshot is not None and self.current_match_selected():
+            self.editor.textCursor().insertText(self.replace_field.text())
+        self.find_next()
+
+    def replace_all(self):
+        """Replace every non-overlapping match in one edit transaction and undo step."""
+        query = self.find_field.text()
+        if not query:
+            return
+        case_sensitive = self.case_action.isChecked()
+        if self.snapshot is not None and self.complete and (query, case_sensitive) == (self.query, self.case_sensitive):
+            matches = self.matches
+        else:
+            self.cancel_search()
+            matches = list(find_positions(self.editor.toPlainText(), query, case_sensitive))
+        match_length = document_length(query)
+
+        positions = []
+        end = -1
+        for position in matches:
+            if position >= end:
+                positions.append(position)
+                end = position + match_length
+
+        replacement = self.replace_field.text()
+        cursor = QTextCursor(self.editor.document())
+        with self.editor.edit_transaction():
+            cursor.beginEditBlock()
+            # Back to front, so earlier positions stay valid
+            for position in reversed(positions):
+                cursor.setPosition(position)
+                cursor.setPosition(position + match_length, QTextCursor.KeepAnchor)
+                cursor.insertText(replacement)
+            cursor.endEditBlock()
+        self.window().statusBar().showMessage(f"Replaced {len(positions)} matches", 3000)
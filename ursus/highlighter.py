@@ -1,38 +1,79 @@
-from PySide6.QtGui import QSyntaxHighlighter, QTextCharFormat, QFont, QColor
-from PySide6.QtCore import QRegularExpression
-import re
+from PySide6.QtGui import QSyntaxHighlighter, QTextBlockUserData, QTextCharFormat, QTextLayout, QFont, QColor
+from PySide6.QtCore import QRegularExpression, QTimer
+from bisect import bisect_right
+import time
+from .config import Config
+from .lexer import tokenize, match_fence, is_closing_fence, setext_level
 
-class MarkdownHighlighter(QSyntaxHighlighter):
-    """Syntax highlighter for markdown."""
-    
-    # Pre-compiled regex patterns for better performance
-    _compiled_patterns = {
-        'bold': re.compile(r'\*\*([^*]+)\*\*'),
-        'italic_star': re.compile(r'(?<!\*)\*([^*]+)\*(?!\*)'),
-        'italic_underscore': re.compile(r'(?<!\_)\_([^_]+)\_(?!\_)'),
-        'heading5': re.compile(r'^(#####) (.+)'),
-        'heading4': re.compile(r'^(####) (.+)'),
-        'heading3': re.compile(r'^(###) (.+)'),
-        'heading2': re.compile(r'^(##) (.+)'),
-        'heading1': re.compile(r'^(#) (.+)')
-    }
-    
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.parent_widget = parent
-        self.rules = []
-        self.formatting_ranges = []
-        self.cursor_position = 0
-        self.cursor_block_number = 0
 
-        self.bold_format = self.create_text_format(parent.text_size, QFont.Bold)
-        self.italic_format = self.create_text_format(parent.text_size, QFont.StyleItalic)
-        self.heading1_format = self.create_text_format(parent.text_size + 8, QFont.Bold)
-        self.heading2_format = self.create_text_format(parent.text_size + 6, QFont.Bold)
-        self.heading3_format = self.create_text_format(parent.text_size + 4, QFont.Bold)
-        self.heading4_format = self.create_text_format(parent.text_size + 2, QFont.Bold)
-        self.heading5_format = self.create_text_format(parent.text_size + 1, QFont.Bold)
-        
+class BlockData(QTextBlockUserData):
+    """Per-block inline formatting tokens, sorted by start offset."""
+
+    def __init__(self, ranges):
+        super().__init__()
+        self.ranges = ranges
+        self.starts = [r.start for r in ranges]
+        # Running maximum of range ends, so lookups can stop early with nested spans
+        self.max_ends = []
+        max_end = -1
+        for r in ranges:
+            max_end = max(max_end, r.end)
+            self.max_ends.append(max_end)
+
+    def range_at(self, offset):
+        """Return the innermost range containing offset, or None."""
+        index = bisect_right(self.starts, offset) - 1
+        while index >= 0 and self.max_ends[index] >= offset:
+            formatting_range = self.ranges[index]
+            if formatting_range.end >= offset:
+                return formatting_range
+            index -= 1
+        return None
+
+
+def block_data(block):
+    """Return the BlockData of a block, or None if it has no formatting ranges or
+    has not been highlighted yet."""
+    # Some PySide6 releases drop a reference to None whenever a user data getter
+    # returns None, which eventually aborts the interpreter. A block has data
+    # when its state has STATE_DATA set, so only those are read. (Qt can move a
+    # state onto another block when it merges blocks the highlighter has not
+    # reached yet, so even those may have none.)
+    if not state_has_data(block.userState()):
+        return None
+    return block.userData()
+
+
+def state_has_data(state):
+    """Return whether a block state says the block has a BlockData."""
+    return 0 <= state < MarkdownHighlighter.STATE_FENCE and bool(state & MarkdownHighlighter.STATE_DATA)
+
+
+class FormatTable:
+    """Character formats for one text size, shared by all highlighters that use it.
+
+    Only headings have a size of their own; other text follows the editor's
+    font, so zooming only has to re-highlight the headings.
+    """
+
+    _tables = {}
+
+    @classmethod
+    def for_size(cls, text_size):
+        table = cls._tables.get(text_size)
+        if table is None:
+            table = cls._tables[text_size] = cls(text_size)
+        return table
+
+    def __init__(self, text_size):
+        self.bold_format = self.create_text_format(None, QFont.Bold)
+        self.italic_format = self.create_text_format(None, QFont.StyleItalic)
+        self.heading1_format = self.create_text_format(text_size + 8, QFont.Bold)
+        self.heading2_format = self.create_text_format(text_size + 6, QFont.Bold)
+        self.heading3_format = self.create_text_format(text_size + 4, QFont.Bold)
+        self.heading4_format = self.create_text_format(text_size + 2, QFont.Bold)
+        self.heading5_format = self.create_text_format(text_size + 1, QFont.Bold)
+
         # Create format for hiding formatting characters without gaps
         self.hidden_format = QTextCharFormat()
         # Use a very small font and make it transparent
@@ -43,126 +84,494 @@ class MarkdownHighlighter(QSyntaxHighlighter):
         # Also set font size percentage to make it as small as possible
         self.hidden_format.setFontPointSize(0.1)
 
-        # Heading patterns are now handled separately in highlightBlock
+        self.quote_format = self.create_text_format(None, QFont.StyleItalic)
+        self.code_format = QTextCharFormat()
+        self.code_format.setFontFamilies(["monospace"])
+        self.code_format.setFontStyleHint(QFont.Monospace)
+
+        # Map lexer token types to their formats
+        self.token_formats = {
+            'bold': self.bold_format,
+            'italic': self.italic_format,
+            'heading1': self.heading1_format,
+            'heading2': self.heading2_format,
+            'heading3': self.heading3_format,
+            'heading4': self.heading4_format,
+            'heading5': self.heading5_format,
+            'quote': self.quote_format,
+        }
+        self.block_token_types = {'heading1', 'heading2', 'heading3', 'heading4', 'heading5', 'quote'}
 
     def create_text_format(self, size, style):
-        font = QFont("Montserrat", size)
+        """Return a Montserrat format in style, of the given size or the editor's if None."""
+        fmt = QTextCharFormat()
+        fmt.setFontFamilies(["Montserrat"])
+        if size is not None:
+            fmt.setFontPointSize(size)
         if isinstance(style, QFont.Weight):
-            font.setWeight(style)
+            fmt.setFontWeight(style)
         else:
-            font.setStyle(style)
-        fmt = QTextCharFormat()
-        fmt.setFont(font)
+            fmt.setFontItalic(style == QFont.StyleItalic)
         return fmt
 
+
+class MarkdownHighlighter(QSyntaxHighlighter):
+    """Syntax highlighter for markdown."""
+
+    # Block states. Qt only re-highlights the following block when a block's
+    # state changes, so multi-line constructs stay cheap to edit.
+    STATE_NORMAL = 0
+    STATE_PARAGRAPH = 1  # Plain text line that a setext underline may follow
+    STATE_SETEXT = 2  # Set on STATE_PARAGRAPH when the next line underlines it
+    STATE_DATA = 0x80  # Set on the states above when the block has formatting ranges
+    STATE_FENCE = 0x100  # Fence length and a tilde flag are packed below this bit
+
+    # Delay before background highlighting resumes after an edit (ms)
+    PROGRESSIVE_RESUME_DELAY = 100
+    
+    def __init__(self, parent):
+        # Attach to the document explicitly; only QTextEdit parents are picked up by Qt
+        super().__init__(parent.document())
+        self.parent_widget = parent
+        self.outline = parent.outline
+        self.rules = []
+        self.cursor_position = 0
+        self.cursor_block_number = 0
+        # (block number, block revision, innermost span) the markers were last revealed for
+        self.revealed = None
+
+        # Progressive highlighting: blocks from highlight_frontier onwards are only
+        # highlighted when visible, until the background timer reaches them
+        self.suspended = False
+        self.highlight_frontier = None
+        self.visible_first = 0
+        self.visible_last = -1
+        self.progressive_timer = QTimer(self)
+        self.progressive_timer.setSingleShot(True)
+        self.progressive_timer.timeout.connect(self.highlight_next_chunk)
+        # First block left for the background pass while Qt was still propagating
+        # a state change, i.e. the first block whose state may be stale
+        self.skipped_block = None
+        self.block_count = self.document().blockCount()
+        # Frontier of a progressive pass interrupted by an edit transaction
+        self.transaction_frontier = None
+        # Block reformat_block is highlighting, the setFormat calls made for it, and
+        # the document range whose layout flush_formats has to redo
+        self.batch_block = None
+        self.batch_formats = []
+        self.dirty_start = None
+        self.dirty_end = None
+
+        self.set_format_table(FormatTable.for_size(parent.text_size))
+
+        # Setext headings depend on the following line, which Qt never propagates back
+        self.document().contentsChange.connect(self.on_contents_change)
+
+    def set_format_table(self, formats):
+        # Formats are shared by every highlighter with the same text size
+        self.hidden_format = formats.hidden_format
+        self.code_format = formats.code_format
+        self.token_formats = formats.token_formats
+        self.block_token_types = formats.block_token_types
+
+    def set_text_size(self, text_size):
+        """Switch to the formats of another text size, re-highlighting only the
+        headings, whose formats are the only ones with a size of their own, and
+        laying them out again in one pass."""
+        self.set_format_table(FormatTable.for_size(text_size))
+        document = self.document()
+        for block_number, level, title in self.outline.entries():
+            block = document.findBlockByNumber(block_number)
+            if block.isValid():
+                self.reformat_block(block)
+        self.flush_formats()
+
     def set_cursor_position(self, position):
         self.cursor_position = position
+        previous_block_number = self.cursor_block_number
         # Calculate which block (line) the cursor is on
-        cursor = self.parent_widget.textCursor()
-        cursor.setPosition(position)
-        self.cursor_block_number = cursor.blockNumber()
-        self.rehighlight()
+        document = self.document()
+        block = document.findBlock(position)
+        self.cursor_block_number = block.blockNumber()
+
+        # Spans nest, so the innermost span at the cursor determines every revealed marker.
+        # Moving within the same span of an unedited block changes nothing.
+        data = block_data(block)
+        span = data.range_at(position - block.position()) if data is not None else None
+        revealed = (self.cursor_block_number, block.revision(), span)
+        if revealed == self.revealed:
+            return
+        self.revealed = revealed
+
+        # Markers are only revealed on the cursor's line, so only the block the
+        # cursor left and the block it entered need to be highlighted again
+        if previous_block_number != self.cursor_block_number:
+            previous_block = document.findBlockByNumber(previous_block_number)
+            if previous_block.isValid():
+                self.rehighlightBlock(previous_block)
+        if block.isValid():
+            self.rehighlightBlock(block)
+
+    def formatting_range_at(self, position):
+        """Return the block and formatting range containing a document position."""
+        block = self.document().findBlock(position)
+        data = block_data(block)
+        if data is None:
+            return block, None
+        return block, data.range_at(position - block.position())
+
+    def suspend(self):
+        """Skip all highlighting, e.g. while a large document is being loaded."""
+        self.stop_progressive()
+        self.suspended = True
+
+    def start_progressive(self, first_block_number=0):
+        """Highlight the viewport now and the rest of the document, from the given
+        block onwards, in time-sliced chunks."""
+        self.suspended = False
+        self.highlight_frontier = first_block_number
+        self.highlight_visible_blocks()
+        self.progressive_timer.start(0)
+
+    def stop_progressive(self):
+        """Cancel background highlighting and highlight every block on demand again."""
+        self.progressive_timer.stop()
+        self.suspended = False
+        self.highlight_frontier = None
+
+    def begin_transaction(self):
+        """Stop highlighting during a bulk edit, until end_transaction."""
+        self.transaction_frontier = self.highlight_frontier
+        self.suspend()
+
+    def end_transaction(self, start=None, end=None):
+        """Resume highlighting, highlighting the blocks between document positions
+        start and end once, or progressively if there are many of them."""
+        self.suspended = False
+        frontier, self.transaction_frontier = self.transaction_frontier, None
+        if start is None:
+            if frontier is not None:
+                self.start_progressive(frontier)
+            return
+        document = self.document()
+        end = min(end, document.characterCount() - 1)
+        first = document.findBlock(start)
+        # The line above may be a setext heading underlined by the first edited line
+        if first.previous().isValid():
+            first = first.previous()
+        last = document.findBlock(end)
+        if frontier is not None or end - start >= Config.progressive_highlight_threshold:
+            first_number = first.blockNumber()
+            self.start_progressive(first_number if frontier is None else min(frontier, first_number))
+        else:
+            self.highlight_blocks(first, last)
+
+    def highlight_blocks(self, first, last):
+        """Highlight the blocks from first to last, and on while states change."""
+        last_number = last.blockNumber()
+        block = first
+        state_changed = False
+        while block.isValid() and (state_changed or block.blockNumber() <= last_number):
+            state_changed = self.reformat_block(block)
+            block = block.next()
+        self.flush_formats()
+
+    def on_viewport_changed(self):
+        """Highlight newly visible blocks first, then reschedule the background pass."""
+        if self.highlight_frontier is None:
+            return
+        self.progressive_timer.stop()
+        self.highlight_visible_blocks()
+        self.progressive_timer.start(0)
+
+    def highlight_visible_blocks(self):
+        self.visible_first, self.visible_last = self.parent_widget.visible_block_range()
+        block = self.document().findBlockByNumber(max(self.visible_first, self.highlight_frontier))
+        block_number = block.blockNumber()
+        while block.isValid() and block_number <= self.visible_last:
+            self.reformat_block(block)
+            block = block.next()
+            block_number += 1
+        self.flush_formats()
+        self.skipped_block = None
+
+    def highlight_next_chunk(self):
+        """Highlight blocks at the frontier until the time budget for this tick is spent."""
+        deadline = time.perf_counter() + Config.highlight_budget_ms / 1000
+        block = self.document().findBlockByNumber(self.highlight_frontier)
+        while block.isValid() and time.perf_counter() < deadline:
+            self.highlight_frontier += 1
+            self.reformat_block(block)
+            block = block.next()
+        # Laying the chunk out again costs about as much as a single block would
+        self.flush_formats()
+        self.skipped_block = None
+        if block.isValid():
+            self.progressive_timer.start(0)
+        else:
+            self.highlight_frontier = None
+
+    def reformat_block(self, block):
+        """Highlight a block like rehighlightBlock, but leave laying it out again to
+        flush_formats. Return whether the block's state changed.
+
+        A shown QTextEdit lays out the rest of the document again whenever a block
+        is marked dirty, so blocks highlighted together are laid out together.
+        """
+        layout = block.layout()
+        state = block.userState()
+        if layout.preeditAreaText():
+            # Qt keeps the formats of text being composed in the same list
+            self.rehighlightBlock(block)
+            return block.userState() != state
+        text = block.text()
+        self.batch_block = block
+        self.batch_formats = []
+        try:
+            self.highlightBlock(text)
+        finally:
+            self.batch_block = None
+        ranges = self.format_ranges(len(text))
+        # The formats of a FormatRange only live as long as the list holding it
+        current = layout.formats()
+        if [(r.start, r.length, r.format) for r in current] != ranges:
+            layout.setFormats([self.format_range(*r) for r in ranges])
+            start = block.position()
+            end = start + block.length()
+            if self.dirty_start is None:
+                self.dirty_start, self.dirty_end = start, end
+            else:
+                self.dirty_start = min(self.dirty_start, start)
+                self.dirty_end = max(self.dirty_end, end)
+        return block.userState() != state
+
+    def format_ranges(self, length):
+        """Return the (start, length, format) runs of the setFormat calls made for a
+        block of the given length, later calls winning like in QSyntaxHighlighter."""
+        formats = [None] * length
+        bounds = set()
+        for start, count, fmt in self.batch_formats:
+            end = min(start + count, length)
+            if 0 <= start < end:
+                formats[start:end] = [fmt] * (end - start)
+                bounds.update((start, end))
+        bounds = sorted(bounds)
+        ranges = []
+        for start, end in zip(bounds, bounds[1:]):
+            fmt = formats[start]
+            if fmt is None:
+                continue
+            if ranges and ranges[-1][0] + ranges[-1][1] == start and ranges[-1][2] == fmt:
+                ranges[-1] = (ranges[-1][0], ranges[-1][1] + end - start, fmt)
+            else:
+                ranges.append((start, end - start, fmt))
+        return ranges
+
+    @staticmethod
+    def format_range(start, length, fmt):
+        format_range = QTextLayout.FormatRange()
+        format_range.start = start
+        format_range.length = length
+        format_range.format = fmt
+        return format_range
+
+    def flush_formats(self):
+        """Lay out the blocks reformat_block changed since the last flush, at once."""
+        if self.dirty_start is None:
+            return
+        self.document().markContentsDirty(self.dirty_start, self.dirty_end - self.dirty_start)
+        self.dirty_start = self.dirty_end = None
+
+    # While reformat_block runs, highlightBlock works on its block instead of the
+    # one QSyntaxHighlighter would be highlighting
+
+    def currentBlock(self):
+        if self.batch_block is None:
+            return super().currentBlock()
+        return self.batch_block
+
+    def currentBlockState(self):
+        if self.batch_block is None:
+            return super().currentBlockState()
+        return self.batch_block.userState()
+
+    def previousBlockState(self):
+        if self.batch_block is None:
+            return super().previousBlockState()
+        previous_block = self.batch_block.previous()
+        return previous_block.userState() if previous_block.isValid() else -1
+
+    def setCurrentBlockState(self, state):
+        if self.batch_block is None:
+            super().setCurrentBlockState(state)
+        else:
+            self.batch_block.setUserState(state)
+
+    def setCurrentBlockUserData(self, data):
+        if self.batch_block is None:
+            super().setCurrentBlockUserData(data)
+        else:
+            self.batch_block.setUserData(data)
+
+    def setFormat(self, start, count, fmt):
+        if self.batch_block is None:
+            super().setFormat(start, count, fmt)
+        else:
+            self.batch_formats.append((start, count, fmt))
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        """Re-highlight the line above an edit if its setext underline appeared or went away."""
+        document = self.document()
+        block_count = document.blockCount()
+        delta = block_count - self.block_count
+        self.block_count = block_count
+        if self.suspended:
+            return
+        block = document.findBlock(position)
+        if self.highlight_frontier is not None:
+            self.move_frontier(block.blockNumber(), position + chars_added, delta)
+            self.progressive_timer.start(self.PROGRESSIVE_RESUME_DELAY)
+        previous_block = block.previous()
+        if not previous_block.isValid():
+            return
+        state = previous_block.userState()
+        if state < 0 or state >= self.STATE_FENCE or not state & self.STATE_PARAGRAPH:
+            return
+        underlined = setext_level(block.text()) > 0
+        if underlined != bool(state & self.STATE_SETEXT):
+            self.rehighlightBlock(previous_block)
+
+    def move_frontier(self, first_number, end, delta):
+        """Keep the frontier on the same line after an edit of blocks first_number
+        to the one at position end, which added delta lines."""
+        document = self.document()
+        last_new = document.findBlock(min(end, document.characterCount() - 1)).blockNumber()
+        last_old = last_new - delta
+        if self.highlight_frontier > last_old:
+            self.highlight_frontier += delta
+        elif self.highlight_frontier > first_number:
+            # Qt has highlighted every edited block
+            self.highlight_frontier = last_new + 1
+        if self.skipped_block is not None:
+            # A state change stopped at the frontier, before the lines it shifted
+            self.highlight_frontier = min(self.highlight_frontier, self.skipped_block)
+            self.skipped_block = None
 
     def highlightBlock(self, text):
+        if self.suspended:
+            return
+        block_number = self.currentBlock().blockNumber()
+        if self.highlight_frontier is not None:
+            if (block_number >= self.highlight_frontier and
+                    not self.visible_first <= block_number <= self.visible_last):
+                # Left for the background pass, keeping the block's state unchanged
+                if self.skipped_block is None:
+                    self.skipped_block = block_number
+                return
+
+        # Only blocks with formatting ranges get a BlockData, see block_data
+        self.block_has_data = state_has_data(self.currentBlockState())
+        previous_state = max(self.previousBlockState(), self.STATE_NORMAL)
+        cursor_on_this_line = (block_number == self.cursor_block_number)
+
+        if previous_state >= self.STATE_FENCE:
+            self.outline.set_heading(block_number, 0, "")
+            self.highlight_fenced_line(text, previous_state, cursor_on_this_line)
+            return
+
+        fence = match_fence(text)
+        if fence:
+            # Opening fence; only the fence characters are hidden, the info string stays
+            char, length, marker_end = fence
+            self.setFormat(0, len(text), self.code_format)
+            if not cursor_on_this_line:
+                self.setFormat(0, marker_end, self.hidden_format)
+            self.setCurrentBlockState(self.STATE_FENCE + (min(length, 0x7f) << 1) + (char == '~'))
+            self.clear_block_data()
+            self.outline.set_heading(block_number, 0, "")
+            return
+
+        level = setext_level(text)
+        if level and previous_state & self.STATE_PARAGRAPH:
+            # Setext underline; the heading itself is formatted on the line above
+            if not cursor_on_this_line:
+                self.setFormat(0, len(text), self.hidden_format)
+            self.setCurrentBlockState(self.STATE_NORMAL)
+            self.clear_block_data()
+            self.outline.set_heading(block_number, 0, "")
+            return
+
+        tokens = tokenize(text)
+        state = self.STATE_NORMAL
+        starts_block = bool(tokens) and tokens[0].type in self.block_token_types
+        heading_level = 0
+        if starts_block and tokens[0].type.startswith('heading'):
+            heading_level = int(tokens[0].type[-1])
+            heading_title = text[tokens[0].content_start:tokens[0].content_end]
+        # A "---" line that does not underline a paragraph is a thematic break
+        if text.strip() and level != 2 and not starts_block:
+            state = self.STATE_PARAGRAPH
+            next_block = self.currentBlock().next()
+            next_level = setext_level(next_block.text()) if next_block.isValid() else 0
+            if next_level:
+                self.setFormat(0, len(text), self.token_formats[f'heading{next_level}'])
+                state |= self.STATE_SETEXT
+                heading_level = next_level
+                heading_title = text
+        self.setCurrentBlockState(state)
+        self.outline.set_heading(block_number, heading_level, heading_title.strip() if heading_level else "")
+
+        self.highlight_inline(text, tokens, cursor_on_this_line)
+
+    def highlight_fenced_line(self, text, fence_state, cursor_on_this_line):
+        """Format a line inside a fenced code block, closing the block if it is a fence."""
+        self.setFormat(0, len(text), self.code_format)
+        self.clear_block_data()
+        fence_info = fence_state - self.STATE_FENCE
+        char = '~' if fence_info & 1 else '`'
+        if is_closing_fence(text, char, fence_info >> 1):
+            if not cursor_on_this_line:
+                self.setFormat(0, len(text), self.hidden_format)
+            self.setCurrentBlockState(self.STATE_NORMAL)
+        else:
+            self.setCurrentBlockState(fence_state)
+
+    def highlight_inline(self, text, tokens, cursor_on_this_line):
+        """Apply token formats, hiding markers the cursor is not near."""
         block_start = self.currentBlock().position()
-        current_block_number = self.currentBlock().blockNumber()
-        
-        # Clear previous formatting ranges for this block
-        self.formatting_ranges = [r for r in self.formatting_ranges if r['block_start'] != block_start]
-        
-        # Handle headings with cursor-based visibility using pre-compiled patterns
-        heading_patterns = [
-            ('heading5', self.heading5_format),
-            ('heading4', self.heading4_format),
-            ('heading3', self.heading3_format),
-            ('heading2', self.heading2_format),
-            ('heading1', self.heading1_format)
-        ]
-        
-        for pattern_name, heading_format in heading_patterns:
-            match = self._compiled_patterns[pattern_name].match(text)
-            if match:
-                # Get the hash characters and content
-                hash_chars = match.group(1)  # The # characters
-                content = match.group(2)     # The text after space
-                hash_length = len(hash_chars)
-                content_start = hash_length + 1  # +1 for the space
-                
-                # Apply formatting to the content (after the # and space)
-                self.setFormat(content_start, len(content), heading_format)
-                
-                # Handle # character visibility based on cursor position
-                cursor_on_this_line = (current_block_number == self.cursor_block_number)
-                
+        ranges = []
+
+        for token in tokens:
+            content_length = token.content_end - token.content_start
+            self.setFormat(token.content_start, content_length, self.token_formats[token.type])
+
+            if token.type in self.block_token_types:
+                # Hide the line's markers (# or >) unless the cursor is on this line
                 if not cursor_on_this_line:
-                    # Hide the # characters and the space
-                    self.setFormat(0, content_start, self.hidden_format)
-                
-                break  # Only one heading pattern can match per line
-        
-        # Handle bold formatting (**text**) using pre-compiled pattern
-        for match in self._compiled_patterns['bold'].finditer(text):
-            start = match.start()
-            length = match.end() - match.start()
-            content_start = start + 2
-            content_length = length - 4
-            absolute_start = block_start + start
-            absolute_end = absolute_start + length
-            
-            # Store formatting range info
-            range_info = {
-                'block_start': block_start,
-                'start': start,
-                'end': start + length,
-                'content_start': content_start,
-                'content_end': content_start + content_length,
-                'absolute_start': absolute_start,
-                'absolute_end': absolute_end,
-                'type': 'bold'
-            }
-            self.formatting_ranges.append(range_info)
-            
-            # Check if cursor is within this formatting range
-            cursor_in_range = (absolute_start <= self.cursor_position <= absolute_end)
-            
-            # Apply formatting to content
-            self.setFormat(content_start, content_length, self.bold_format)
-            
-            # Hide or show formatting characters based on cursor position
+                    self.setFormat(0, token.content_start, self.hidden_format)
+                continue
+
+            ranges.append(token)
+
+            # Hide formatting characters unless the cursor is within this range
+            cursor_in_range = (cursor_on_this_line and
+                               block_start + token.start <= self.cursor_position <= block_start + token.end)
             if not cursor_in_range:
-                self.setFormat(start, 2, self.hidden_format)  # Hide opening **
-                self.setFormat(start + length - 2, 2, self.hidden_format)  # Hide closing **
-        
-        # Handle italic formatting (*text* and _text_) using pre-compiled patterns
-        for pattern_name in ['italic_star', 'italic_underscore']:
-            for match in self._compiled_patterns[pattern_name].finditer(text):
-                start = match.start()
-                length = match.end() - match.start()
-                content_start = start + 1
-                content_length = length - 2
-                absolute_start = block_start + start
-                absolute_end = absolute_start + length
-                
-                # Store formatting range info
-                range_info = {
-                    'block_start': block_start,
-                    'start': start,
-                    'end': start + length,
-                    'content_start': content_start,
-                    'content_end': content_start + content_length,
-                    'absolute_start': absolute_start,
-                    'absolute_end': absolute_end,
-                    'type': 'italic'
-                }
-                self.formatting_ranges.append(range_info)
-                
-                # Check if cursor is within this formatting range
-                cursor_in_range = (absolute_start <= self.cursor_position <= absolute_end)
-                
-                # Apply formatting to content
-                self.setFormat(content_start, content_length, self.italic_format)
-                
-                # Hide or show formatting characters based on cursor position
-                if not cursor_in_range:
-                    self.setFormat(start, 1, self.hidden_format)  # Hide opening char
-                    self.setFormat(start + length - 1, 1, self.hidden_format)  # Hide closing char
+                marker_length = token.content_start - token.start
+                self.setFormat(token.start, marker_length, self.hidden_format)
+                self.setFormat(token.content_end, marker_length, self.hidden_format)
+
+        # Keep ranges on the block itself so lookups never scan other blocks
+        if ranges:
+            self.setCurrentBlockUserData(BlockData(ranges))
+            self.setCurrentBlockState(self.currentBlockState() | self.STATE_DATA)
+        else:
+            self.clear_block_data()
+
+    def clear_block_data(self):
+        """Drop the formatting ranges of the current block."""
+        # Most blocks have none and keep no BlockData at all. Ranges a block had are
+        # replaced rather than removed: never with None, which some PySide6 releases
+        # mishandle like the getters (see block_data)
+        if self.block_has_data:
+            self.setCurrentBlockUserData(BlockData([]))
@@ -0,0 +1,89 @@
+from PySide6.QtCore import QThread, Signal
+import re
+
+from .lexer import match_fence, is_closing_fence
+
+_list_item_pattern = re.compile(r'([*+-]|\d+[.)])(\s|$)')
+# Reference links can point anywhere in the document, so blocks cannot be rendered alone
+_reference_definition_pattern = re.compile(r'^ {0,3}\[[^\]]+\]:', re.MULTILINE)
+
+
+def split_blocks(text):
+    """Split markdown into top-level blocks that render the same on their own.
+
+    Blocks end at blank lines outside fenced code, unless the next line is
+    indented or a list item and so may still belong to the previous block.
+    """
+    blocks = []
+    current = []
+    fence = None
+    blank_pending = False
+    for line in text.split("\n"):
+        if fence is not None:
+            if is_closing_fence(line, *fence):
+                fence = None
+        elif not line.strip():
+            blank_pending = True
+        else:
+            if blank_pending and current and not line[0].isspace() and not _list_item_pattern.match(line):
+                blocks.append("\n".join(current))
+                current = []
+            blank_pending = False
+            opening = match_fence(line)
+            if opening:
+                fence = opening[:2]
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+class HtmlCache:
+    """Rendered HTML of top-level markdown blocks, keyed by their text."""
+
+    def __init__(self):
+        self.blocks = {}
+
+    def render(self, text):
+        """Render text to HTML, re-rendering only blocks not seen in the last render."""
+        import mistune
+        if _reference_definition_pattern.search(text):
+            return mistune.markdown(text)
+        # Keep only blocks of this render, so the cache never outgrows the document
+        blocks = {}
+        parts = []
+        for block in split_blocks(text):
+            html = blocks.get(block)
+            if html is None:
+                html = self.blocks.get(block)
+                if html is None:
+                    html = mistune.markdown(block)
+                blocks[block] = html
+            parts.append(html)
+        self.blocks = blocks
+        return "".join(parts)
+
+
+class HtmlRenderer(QThread):
+    """Renders a markdown snapshot to HTML on a worker thread."""
+
+    rendered = Signal(str, str)  # markdown, html
+
+    def __init__(self, text, cache, parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.cache = cache
+
+    def run(self):
+        self.rendered.emit(self.text, self.cache.render(self.text))
+        self.text = None
+
+
+class ExportWarmup(QThread):
+    """Imports the HTML export dependencies in the background after startup."""
+
+    def run(self):
+        import mistune
+        import klembord
+        # Builds and caches mistune's default parser
+        mistune.markdown("")
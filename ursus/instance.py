@@ -0,0 +1,82 @@
+"""Client side of single-instance mode. Must not import PySide6 on POSIX, so
+handing files to a running editor stays much cheaper than starting one."""
+
+import json
+import os
+import socket
+import tempfile
+
+# Seconds to wait for a running editor to accept forwarded files
+HANDOFF_TIMEOUT = 2.0
+
+
+def server_address():
+    """Return the local server name of this user's running editor."""
+    user = os.environ.get("USER") or os.environ.get("USERNAME") or "user"
+    name = f"ursus-{user}"
+    if os.name == "nt":
+        return name  # A named pipe
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"{name}.sock")
+
+
+def encode_request(file_paths):
+    paths = [os.path.abspath(path) for path in file_paths]
+    return (json.dumps({"files": paths}) + "\n").encode("utf-8")
+
+
+def forward_files(file_paths):
+    """Ask a running editor to open file_paths. Return True if it accepted them."""
+    request = encode_request(file_paths)
+    if os.name == "nt":
+        return _forward_with_qt(request)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(HANDOFF_TIMEOUT)
+            connection.connect(server_address())
+            connection.sendall(request)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                data = connection.recv(64)
+                if not data:
+                    break
+                reply += data
+    except OSError:
+        # No editor is running, or it did not answer in time
+        return False
+    return reply == b"ok\n"
+
+
+def server_may_be_running():
+    """Return False if no editor can be listening on the server socket, i.e. it
+    is missing or was left behind by an editor that crashed."""
+    if os.name == "nt":
+        return False  # Named pipes go away with their editor
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(HANDOFF_TIMEOUT)
+            connection.connect(server_address())
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    except OSError:
+        # A busy editor may just be slow to accept
+        return True
+    return True
+
+
+def _forward_with_qt(request):
+    # Windows local servers listen on named pipes, which the socket module cannot open
+    from PySide6.QtNetwork import QLocalSocket
+
+    timeout_ms = int(HANDOFF_TIMEOUT * 1000)
+    connection = QLocalSocket()
+    connection.connectToServer(server_address())
+    if not connection.waitForConnected(timeout_ms):
+        return False
+    connection.write(request)
+    connection.waitForBytesWritten(timeout_ms)
+    reply = b""
+    while not reply.endswith(b"\n") and connection.waitForReadyRead(timeout_ms):
+        reply += bytes(connection.readAll())
+    connection.disconnectFromServer()
+    return reply == b"ok\n"
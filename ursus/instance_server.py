@@ -0,0 +1,81 @@
+from PySide6.QtCore import QObject, Qt
+from PySide6.QtNetwork import QLocalServer
+import json
+
+from .instance import server_address, server_may_be_running
+from .main_window import MainWindow
+
+
+class InstanceServer(QObject):
+    """Owns the editor windows of this process and opens files forwarded by
+    later `ursus` invocations over a local socket."""
+
+    def __init__(self, text_size, editor_mode=None, parent=None):
+        super().__init__(parent)
+        self.text_size = text_size
+        self.editor_mode = editor_mode
+        self.windows = []
+        # Bytes received so far on each open connection
+        self.requests = {}
+        self.server = QLocalServer(self)
+        # Only the same user may hand files to this editor
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def listen(self):
+        """Start accepting forwarded files. Only call this once forwarding has failed.
+        The leftover socket of a crashed editor is replaced, but never one that
+        a running editor may still be listening on."""
+        if server_may_be_running():
+            return False
+        QLocalServer.removeServer(server_address())
+        return self.server.listen(server_address())
+
+    def close(self):
+        self.server.close()
+
+    def new_window(self):
+        window = MainWindow(text_size=self.text_size, editor_mode=self.editor_mode)
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        window.destroyed.connect(lambda: self.windows.remove(window))
+        self.windows.append(window)
+        window.show()
+        return window
+
+    def open_files(self, file_paths):
+        """Open the files as tabs of the most recently opened window, or of a new one.
+
+        Only the last file is shown, so the others are not read until their tab is.
+        """
+        window = self.windows[-1] if self.windows else self.new_window()
+        for n, file_path in enumerate(file_paths, 1):
+            window.open_path(file_path, activate=n == len(file_paths))
+        return window
+
+    def on_new_connection(self):
+        connection = self.server.nextPendingConnection()
+        self.requests[connection] = b""
+        connection.readyRead.connect(lambda: self.on_ready_read(connection))
+        connection.disconnected.connect(lambda: self.on_disconnected(connection))
+
+    def on_disconnected(self, connection):
+        self.requests.pop(connection, None)
+        connection.deleteLater()
+
+    def on_ready_read(self, connection):
+        request = self.requests[connection] + bytes(connection.readAll())
+        self.requests[connection] = request
+        if not request.endswith(b"\n"):
+            return
+        try:
+            file_paths = json.loads(request)["files"]
+        except (ValueError, KeyError, TypeError):
+            connection.disconnectFromServer()
+            return
+        # Answer first, so the forwarding process can exit while the files load
+        connection.write(b"ok\n")
+        connection.flush()
+        connection.disconnectFromServer()
+        window = self.open_files(file_paths) if file_paths else self.new_window()
+        window.raise_()
+        window.activateWindow()
@@ -0,0 +1,183 @@
+"""Opt-in timing of highlighting, cursor tracking, restyling and file I/O.
+
+Enabled with the URSUS_PROFILE / URSUS_TRACE environment variables or the
+--profile / --trace command line flags. install() wraps the hot paths only
+when enabled, so a disabled build runs the original methods untouched.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV = "URSUS_PROFILE"
+TRACE_ENV = "URSUS_TRACE"
+# Bound the trace so a long session cannot exhaust memory
+MAX_TRACE_EVENTS = 500_000
+
+enabled = False
+_stats = {}
+_trace_events = []
+_lock = threading.Lock()
+_start_time = time.perf_counter()
+# Stats recorded with record_value rather than as durations
+_value_stats = {"blocks_per_rehighlight"}
+
+
+class Stats:
+    """Call count, total and a log2 histogram of recorded values."""
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram = {}
+
+    def add(self, value, bucket_value):
+        self.count += 1
+        self.total += value
+        # Bucket n holds values in [2**(n-1), 2**n)
+        bucket = int(bucket_value).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def as_dict(self, unit):
+        return {
+            "count": self.count,
+            f"total_{unit}": self.total,
+            f"mean_{unit}": self.total / self.count if self.count else 0.0,
+            # Durations are bucketed in microseconds
+            "histogram_unit": "us" if unit == "ms" else unit,
+            "histogram": {f"<{2 ** bucket}": n for bucket, n in sorted(self.histogram.items())},
+        }
+
+
+def record_duration(name, start, end):
+    """Record a timed call; start and end come from time.perf_counter()."""
+    duration_ms = (end - start) * 1000
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = Stats()
+        stats.add(duration_ms, duration_ms * 1000)  # Histogram in microseconds
+        if len(_trace_events) < MAX_TRACE_EVENTS:
+            _trace_events.append((name, start, end, threading.get_ident()))
+
+
+def record_value(name, value):
+    """Record a sampled quantity, such as the number of blocks in a rehighlight."""
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = Stats()
+        stats.add(value, value)
+
+
+def call_count(name):
+    stats = _stats.get(name)
+    return stats.count if stats else 0
+
+
+def summary():
+    with _lock:
+        return {name: stats.as_dict("value" if name in _value_stats else "ms")
+                for name, stats in sorted(_stats.items())}
+
+
+def timed(function, name):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_duration(name, start, time.perf_counter())
+    return wrapper
+
+
+def counting_blocks(function, name):
+    """Time a rehighlight and record how many blocks it passed to highlightBlock."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        blocks_before = call_count("highlightBlock")
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_duration(name, start, time.perf_counter())
+            record_value("blocks_per_rehighlight", call_count("highlightBlock") - blocks_before)
+    return wrapper
+
+
+def install():
+    """Wrap the instrumented methods. Must run before the editor is constructed."""
+    from .highlighter import MarkdownHighlighter
+    from .main_widget import EditorMixin
+    from .file_io import FileLoader, FileSaver
+
+    MarkdownHighlighter.highlightBlock = timed(MarkdownHighlighter.highlightBlock, "highlightBlock")
+    MarkdownHighlighter.set_cursor_position = timed(MarkdownHighlighter.set_cursor_position, "set_cursor_position")
+    MarkdownHighlighter.rehighlight = counting_blocks(MarkdownHighlighter.rehighlight, "rehighlight")
+    MarkdownHighlighter.rehighlightBlock = counting_blocks(MarkdownHighlighter.rehighlightBlock, "rehighlightBlock")
+    EditorMixin.change_colors = timed(EditorMixin.change_colors, "change_colors")
+    EditorMixin.change_text_size = timed(EditorMixin.change_text_size, "change_text_size")
+    FileLoader.run = timed(FileLoader.run, "file_load")
+    FileSaver.run = timed(FileSaver.run, "file_save")
+
+    # Time from the first cursor move after a reveal until markers are revealed again,
+    # which includes the cursor_timer debounce
+    on_cursor_position_changed = EditorMixin.on_cursor_position_changed
+    update_highlighting = EditorMixin.update_highlighting
+
+    def on_cursor_position_changed_wrapper(self):
+        if getattr(self, "_reveal_requested_at", None) is None:
+            self._reveal_requested_at = time.perf_counter()
+        return on_cursor_position_changed(self)
+
+    def update_highlighting_wrapper(self):
+        start = time.perf_counter()
+        try:
+            return update_highlighting(self)
+        finally:
+            end = time.perf_counter()
+            record_duration("update_highlighting", start, end)
+            requested_at = getattr(self, "_reveal_requested_at", None)
+            if requested_at is not None:
+                record_duration("cursor_reveal_latency", requested_at, end)
+                self._reveal_requested_at = None
+
+    EditorMixin.on_cursor_position_changed = on_cursor_position_changed_wrapper
+    EditorMixin.update_highlighting = update_highlighting_wrapper
+
+
+def write_summary(path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(summary(), file, indent=2)
+
+
+def write_trace(path):
+    """Write recorded calls in the Chrome trace event format (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    with _lock:
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - _start_time) * 1e6, "dur": (end - start) * 1e6}
+                  for name, start, end, tid in _trace_events]
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def enable(profile_path=None, trace_path=None):
+    """Turn instrumentation on, dumping results to the given files at exit."""
+    global enabled
+    profile_path = profile_path or os.environ.get(PROFILE_ENV)
+    trace_path = trace_path or os.environ.get(TRACE_ENV)
+    if not (profile_path or trace_path) or enabled:
+        return False
+    enabled = True
+    install()
+    if profile_path:
+        atexit.register(write_summary, profile_path)
+    if trace_path:
+        atexit.register(write_trace, trace_path)
+    return True
@@ -0,0 +1,207 @@
+from PySide6.QtCore import QObject, QTimer, QLockFile, QStandardPaths
+from PySide6.QtGui import QTextCursor
+import json
+import os
+import shutil
+import struct
+import uuid
+
+from .config import Config
+from .atomic import write_atomic
+
+# Each delta is (position, chars removed, byte length of added text) followed by the text
+_DELTA_HEADER = struct.Struct("<III")
+
+_META_NAME = "meta.json"
+_LOCK_NAME = "session.lock"
+
+
+def recovery_root():
+    """Return the directory holding one recovery session per running editor."""
+    data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    return os.path.join(data_dir, "recovery")
+
+
+def find_unclean_sessions():
+    """Return session directories left behind by editors that did not shut down cleanly."""
+    root = recovery_root()
+    if not os.path.isdir(root):
+        return []
+    sessions = []
+    for name in sorted(os.listdir(root)):
+        session_dir = os.path.join(root, name)
+        if not os.path.isdir(session_dir):
+            continue
+        # The lock of a running editor is held; a crashed editor's lock is stale
+        lock = QLockFile(os.path.join(session_dir, _LOCK_NAME))
+        if lock.tryLock(0):
+            lock.unlock()
+            sessions.append(session_dir)
+    sessions.sort(key=os.path.getmtime)
+    return sessions
+
+
+def remove_session(session_dir):
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+
+def replay_session(session_dir, document):
+    """Rebuild a crashed session's text in document and return its file path.
+
+    Raises ValueError if the base the journal was recorded against has changed.
+    """
+    with open(os.path.join(session_dir, _META_NAME), "r", encoding="utf-8") as file:
+        meta = json.load(file)
+
+    base = meta["base"]
+    if base == "snapshot":
+        with open(os.path.join(session_dir, meta["snapshot"]), "r", encoding="utf-8") as file:
+            text = file.read()
+    elif base == "file":
+        stat = os.stat(meta["file_path"])
+        if stat.st_size != meta["size"] or stat.st_mtime_ns != meta["mtime_ns"]:
+            raise ValueError(f"{meta['file_path']} changed since the journal was started")
+        with open(meta["file_path"], "r", encoding="utf-8") as file:
+            text = file.read()
+    else:
+        text = ""
+    document.setPlainText(text)
+
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    with open(os.path.join(session_dir, meta["journal"]), "rb") as file:
+        data = file.read()
+    offset = 0
+    # A crash can leave a truncated record at the end, which is ignored
+    while offset + _DELTA_HEADER.size <= len(data):
+        position, removed, added_length = _DELTA_HEADER.unpack_from(data, offset)
+        offset += _DELTA_HEADER.size
+        if offset + added_length > len(data):
+            break
+        added = data[offset:offset + added_length].decode("utf-8")
+        offset += added_length
+        cursor.setPosition(position)
+        cursor.setPosition(position + removed, QTextCursor.KeepAnchor)
+        cursor.insertText(added)
+    cursor.endEditBlock()
+    return meta["file_path"]
+
+
+class RecoveryJournal(QObject):
+    """Appends document edits to a per-session log so they survive a crash."""
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.session_dir = os.path.join(recovery_root(), uuid.uuid4().hex)
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.lock = QLockFile(os.path.join(self.session_dir, _LOCK_NAME))
+        self.lock.tryLock(0)
+
+        self.paused = False
+        self.pending = bytearray()
+        self.journal_size = 0
+        # Number of deltas recorded since the journal was last reset
+        self.delta_count = 0
+        self.journal_file = None
+        self.file_path = None
+        # Every reset writes a new journal (and snapshot) generation; meta.json
+        # is switched to it atomically, so a crash never pairs mismatched files
+        self.generation = 0
+        self.reset()
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+        self.document.contentsChange.connect(self.on_contents_change)
+
+    def set_document(self, document):
+        """Record edits of another document, e.g. after the editor widget was replaced."""
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        self.document.contentsChange.connect(self.on_contents_change)
+
+    def pause(self):
+        """Stop recording, e.g. while a file is being streamed in."""
+        self.paused = True
+
+    def reset(self, file_path=None, base="empty"):
+        """Start a new, empty journal on top of the given base.
+
+        The base is "empty", "file" (file_path as it is on disk now) or "snapshot".
+        """
+        self.generation += 1
+        self.file_path = file_path
+        journal_name = f"journal-{self.generation}.bin"
+        meta = {"base": base, "file_path": file_path, "journal": journal_name}
+        if base == "file":
+            stat = os.stat(file_path)
+            meta["size"] = stat.st_size
+            meta["mtime_ns"] = stat.st_mtime_ns
+        elif base == "snapshot":
+            meta["snapshot"] = f"snapshot-{self.generation}.txt"
+            write_atomic(os.path.join(self.session_dir, meta["snapshot"]), self.document.toPlainText())
+
+        self.pending.clear()
+        self.journal_size = 0
+        self.delta_count = 0
+        if self.journal_file is not None:
+            self.journal_file.close()
+        self.journal_file = open(os.path.join(self.session_dir, journal_name), "wb")
+        write_atomic(os.path.join(self.session_dir, _META_NAME), json.dumps(meta))
+        self.remove_old_generations()
+        self.paused = False
+
+    def remove_old_generations(self):
+        current = (f"journal-{self.generation}.bin", f"snapshot-{self.generation}.txt")
+        for name in os.listdir(self.session_dir):
+            if name.startswith(("journal-", "snapshot-")) and name not in current:
+                os.remove(os.path.join(self.session_dir, name))
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        if self.paused:
+            return
+        # The document's end-of-text character can be included in the count
+        end = min(position + chars_added, self.document.characterCount() - 1)
+        added = ""
+        if end > position:
+            cursor = QTextCursor(self.document)
+            cursor.setPosition(position)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            # selectedText() returns line breaks as U+2029
+            added = cursor.selectedText().replace("\u2029", "\n")
+        added_bytes = added.encode("utf-8")
+        self.pending += _DELTA_HEADER.pack(position, chars_removed, len(added_bytes))
+        self.pending += added_bytes
+        self.delta_count += 1
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(Config.autosave_interval_ms)
+
+    def flush(self):
+        """Append buffered deltas to the journal, compacting it once it gets large."""
+        if not self.pending:
+            return
+        self.journal_file.write(self.pending)
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+        self.journal_size += len(self.pending)
+        self.pending.clear()
+        # Compact only after a document's worth of deltas, so I/O stays proportional to typing
+        if self.journal_size > max(Config.journal_compact_bytes, self.document.characterCount()):
+            self.compact()
+
+    def compact(self):
+        """Replace the journal with a snapshot of the current text."""
+        self.reset(self.file_path, base="snapshot")
+
+    def close(self, keep=False):
+        """Stop recording and drop the session, or with keep=True leave it behind
+        for find_unclean_sessions, e.g. for unsaved text nobody chose to discard."""
+        self.flush_timer.stop()
+        if keep:
+            self.flush()
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.journal_file.close()
+        self.lock.unlock()
+        if not keep:
+            remove_session(self.session_dir)
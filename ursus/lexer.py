@@ -0,0 +1,89 @@
+"""Qt-independent markdown lexer working on a single line at a time."""
+
+from collections import namedtuple
+from functools import lru_cache
+import re
+
+# Maximum number of distinct lines whose tokens are kept in the cache
+CACHE_SIZE = 32768
+
+# Offsets are relative to the start of the line; markers sit outside content
+Token = namedtuple('Token', ['type', 'start', 'end', 'content_start', 'content_end'])
+
+_heading_pattern = re.compile(r'(#{1,5}) (.+)')
+_quote_pattern = re.compile(r' {0,3}> ?')
+_fence_pattern = re.compile(r' {0,3}(`{3,}|~{3,})')
+_setext_pattern = re.compile(r' {0,3}(=+|-+)[ \t]*$')
+
+# Alternation so every inline construct is found in a single scan of the line
+_inline_pattern = re.compile(
+    r'(?P<bold>\*\*[^*]+\*\*)'
+    r'|(?P<italic_star>(?<!\*)\*[^*]+\*(?!\*))'
+    r'|(?P<italic_underscore>(?<!_)_[^_]+_(?!_))'
+)
+
+# Token type and marker width for each named group
+_inline_groups = {
+    'bold': ('bold', 2),
+    'italic_star': ('italic', 1),
+    'italic_underscore': ('italic', 1),
+}
+
+
+def _scan_inline(text, pos, endpos, tokens):
+    for match in _inline_pattern.finditer(text, pos, endpos):
+        token_type, marker_length = _inline_groups[match.lastgroup]
+        start, end = match.span()
+        content_start = start + marker_length
+        content_end = end - marker_length
+        tokens.append(Token(token_type, start, end, content_start, content_end))
+        # Spans can nest, e.g. _italic_ inside **bold**
+        _scan_inline(text, content_start, content_end, tokens)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def tokenize(text):
+    """Return the tokens of a line as a tuple sorted by start offset."""
+    tokens = []
+    match = _heading_pattern.match(text)
+    if match:
+        level = len(match.group(1))
+        tokens.append(Token(f'heading{level}', 0, len(text), level + 1, len(text)))
+    else:
+        match = _quote_pattern.match(text)
+        if match:
+            tokens.append(Token('quote', 0, len(text), match.end(), len(text)))
+    _scan_inline(text, 0, len(text), tokens)
+    return tuple(tokens)
+
+
+def match_fence(text):
+    """Return (fence character, fence length, marker end) if text is a code fence line."""
+    match = _fence_pattern.match(text)
+    if not match:
+        return None
+    marker = match.group(1)
+    if marker[0] == '`' and '`' in text[match.end():]:
+        # Backtick fences cannot have backticks in their info string
+        return None
+    return marker[0], len(marker), match.end()
+
+
+def is_closing_fence(text, char, length):
+    """Return True if text closes a fence opened with length characters of char."""
+    fence = match_fence(text)
+    return (fence is not None and fence[0] == char and fence[1] >= length
+            and not text[fence[2]:].strip())
+
+
+def setext_level(text):
+    """Return 1 or 2 if text could underline a setext heading, otherwise 0."""
+    match = _setext_pattern.match(text)
+    if not match:
+        return 0
+    return 1 if match.group(1)[0] == '=' else 2
+
+
+def clear_cache():
+    """Drop all cached tokenization results."""
+    tokenize.cache_clear()
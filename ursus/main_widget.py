@@ -1,29 +1,65 @@
-from PySide6.QtWidgets import QTextEdit
+from PySide6.QtWidgets import QTextEdit, QPlainTextEdit
 from PySide6.QtGui import QFontDatabase, QFont, QTextCursor
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QTimer, QPoint, QByteArray
+from contextlib import contextmanager, nullcontext
 import re
+import time
+from .config import Config
 from .highlighter import MarkdownHighlighter
+from .outline import OutlineIndex
+from .resources import FONT_FILES, read_resource
+from .text_access import TextAccess
+from .theme import palette_for
 
-class MainWidget(QTextEdit):
+class EditorMixin:
+    """Markdown editing behaviour shared by the QTextEdit and QPlainTextEdit editors."""
     _fonts_loaded = False  # Class variable to avoid loading fonts multiple times
+
+    # The delay before markers are revealed at the cursor is a multiple of the
+    # recent cost of update_highlighting, within these bounds (ms)
+    MIN_REVEAL_DELAY = 0
+    MAX_REVEAL_DELAY = 250
+    REVEAL_COST_FACTOR = 4
+    # Weight of the latest measurement in the running average of that cost
+    REVEAL_COST_SMOOTHING = 0.3
+    # Margin around the text, as a fraction of the editor's width
+    PADDING_RATIO = 0.1
     
-    def __init__(self, text_size=12):
-        super().__init__()
+    def setup_editor(self, text_size):
         self.text_size = text_size
-        self.lazy_load_fonts()
+        # Fonts are registered after the first paint, see paintEvent
+        self.fonts_pending = False
         self.set_default_style()
         self.setup_cursor()
         self.setup_cursor_tracking()
+        # The outline must see edits before the highlighter reports the edited blocks
+        self.outline = OutlineIndex(self.document(), self)
         # Initialize highlighter after main setup for faster startup
         self.highlighter = MarkdownHighlighter(self)
+        self.text_access = TextAccess(self)
+        self.transaction_depth = 0
+        self.transaction_range = None
+        self.verticalScrollBar().valueChanged.connect(self.highlighter.on_viewport_changed)
 
     def lazy_load_fonts(self):
-        """Load fonts only once per application session."""
-        if not MainWidget._fonts_loaded:
-            QFontDatabase.addApplicationFont("resources/Montserrat-Regular.ttf")
-            QFontDatabase.addApplicationFont("resources/Montserrat-Italic.ttf")
-            QFontDatabase.addApplicationFont("resources/Montserrat-Bold.ttf")
-            MainWidget._fonts_loaded = True
+        """Register the packaged fonts, once per application session."""
+        if not EditorMixin._fonts_loaded:
+            for name in FONT_FILES:
+                QFontDatabase.addApplicationFontFromData(QByteArray(read_resource(name)))
+            EditorMixin._fonts_loaded = True
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not EditorMixin._fonts_loaded and not self.fonts_pending:
+            # Keep font registration off the startup path, until the window is on screen
+            self.fonts_pending = True
+            QTimer.singleShot(0, self, self.load_fonts_after_paint)
+
+    def load_fonts_after_paint(self):
+        self.lazy_load_fonts()
+        # Lay the text out again with the registered fonts
+        self.set_text_size(self.text_size)
+        self.document().markContentsDirty(0, self.document().characterCount())
     
     def load_fonts(self):
         """Deprecated - use lazy_load_fonts instead."""
@@ -34,13 +70,35 @@ class MainWidget(QTextEdit):
         self.set_text_size(self.text_size)
 
     def change_colors(self, bg="black", fg="green"):
-        padding = str(int(self.width() * 0.1))
-        self.setStyleSheet(f"background-color: {bg}; color: {fg}; padding: {padding}px;")
+        # A palette only repaints, where a style sheet would re-polish the widget
+        self.colors = (bg, fg)
+        self.setPalette(palette_for(self.colors))
 
     def set_text_size(self, size):
         font_regular = QFont("Montserrat", size)
         self.setFont(font_regular)
 
+    def change_text_size(self, size):
+        """Zoom to another text size, keeping the cursor in view."""
+        if size == self.text_size:
+            return
+        self.text_size = size
+        # Only the visible part of the document is laid out again right away
+        self.set_text_size(size)
+        self.highlighter.set_text_size(size)
+        self.ensureCursorVisible()
+
+    def resizeEvent(self, event):
+        # Set before the resize lays the text out again for the new width
+        margin = int(event.size().width() * self.PADDING_RATIO)
+        document = self.document()
+        if margin != document.documentMargin():
+            # Qt counts a margin change as an edit of the document
+            modified = document.isModified()
+            document.setDocumentMargin(margin)
+            document.setModified(modified)
+        super().resizeEvent(event)
+
     def setup_cursor(self):
         self.setCursorWidth(3)
         
@@ -48,138 +106,238 @@ class MainWidget(QTextEdit):
         # Connect cursor position changes to highlighter
         self.cursorPositionChanged.connect(self.on_cursor_position_changed)
         
-        # Use a timer for debouncing to avoid excessive rehighlighting
+        # Use a timer to coalesce cursor moves into at most one pending update
         self.cursor_timer = QTimer()
         self.cursor_timer.setSingleShot(True)
         self.cursor_timer.timeout.connect(self.update_highlighting)
-        
+        self.reveal_cost_ms = 0.0
+
     def on_cursor_position_changed(self):
-        # Debounce cursor position changes to avoid excessive rehighlighting
-        self.cursor_timer.stop()
-        self.cursor_timer.start(100)  # 100ms delay for better performance
-        
+        if self.transaction_depth:
+            return
+        # An update already scheduled reads the latest position when it fires, so
+        # held-down arrow keys neither queue more work nor postpone the reveal
+        if not self.cursor_timer.isActive():
+            self.cursor_timer.start(self.reveal_delay())
+
+    def reveal_delay(self):
+        """Return a delay that is short when revealing is cheap and backs off when it is not."""
+        delay = self.reveal_cost_ms * self.REVEAL_COST_FACTOR
+        return int(min(self.MAX_REVEAL_DELAY, max(self.MIN_REVEAL_DELAY, delay)))
+
     def update_highlighting(self):
+        start = time.perf_counter()
         cursor_position = self.textCursor().position()
         self.highlighter.set_cursor_position(cursor_position)
+        cost = (time.perf_counter() - start) * 1000
+        self.reveal_cost_ms += (cost - self.reveal_cost_ms) * self.REVEAL_COST_SMOOTHING
         
-    def toggle_bold(self):
-        cursor = self.textCursor()
-        if cursor.hasSelection():
-            selected_text = cursor.selectedText()
-            start_pos = cursor.selectionStart()
-            end_pos = cursor.selectionEnd()
-            
-            # Get full text to check surrounding characters
-            full_text = self.toPlainText()
-            
-            # Check if selection includes formatting or if surrounding text has formatting
-            is_bold = False
-            actual_start = start_pos
-            actual_end = end_pos
-            
-            if selected_text.startswith('**') and selected_text.endswith('**') and len(selected_text) > 4:
-                # Selection includes the ** characters
-                is_bold = True
-                actual_start = start_pos + 2
-                actual_end = end_pos - 2
-            elif (start_pos >= 2 and end_pos <= len(full_text) - 2 and 
-                  full_text[start_pos-2:start_pos] == '**' and 
-                  full_text[end_pos:end_pos+2] == '**'):
-                # Selection is surrounded by ** characters
-                is_bold = True
-                actual_start = start_pos - 2
-                actual_end = end_pos + 2
-            
-            if is_bold:
-                # Remove bold formatting
-                cursor.setPosition(actual_start)
-                cursor.setPosition(actual_end, QTextCursor.KeepAnchor)
-                new_text = cursor.selectedText()
-                if new_text.startswith('**') and new_text.endswith('**'):
-                    new_text = new_text[2:-2]
-                cursor.insertText(new_text)
-                # Restore selection on the unformatted text
-                cursor.setPosition(actual_start)
-                cursor.setPosition(actual_start + len(new_text), QTextCursor.KeepAnchor)
+    @contextmanager
+    def edit_transaction(self):
+        """Make bulk edits without highlighting or cursor tracking in between.
+
+        When the outermost transaction ends, the edited range is highlighted once
+        (progressively if it is large) and the cursor is tracked again.
+        """
+        if not self.transaction_depth:
+            self.transaction_range = None
+            self.highlighter.begin_transaction()
+            self.document().contentsChange.connect(self.on_transaction_change)
+        self.transaction_depth += 1
+        try:
+            yield
+        finally:
+            self.transaction_depth -= 1
+            if not self.transaction_depth:
+                self.document().contentsChange.disconnect(self.on_transaction_change)
+                self.highlighter.end_transaction(*(self.transaction_range or ()))
+                self.on_cursor_position_changed()
+
+    def on_transaction_change(self, position, chars_removed, chars_added):
+        """Grow the range edited in this transaction to cover another change."""
+        # Qt reformats one more character after a removal, and so clears the
+        # formats of the block after it while highlighting is suspended
+        change_end = position + chars_added + (chars_removed > 0)
+        if self.transaction_range is None:
+            start, end = position, change_end
+        else:
+            start, end = self.transaction_range
+            if end < position + chars_removed or end <= position:
+                # The range ends before or inside the change
+                end = change_end
             else:
-                # Add bold formatting
-                new_text = f"**{selected_text}**"
-                cursor.insertText(new_text)
-                # Restore selection on the formatted text (excluding the **)
-                cursor.setPosition(start_pos + 2)
-                cursor.setPosition(start_pos + 2 + len(selected_text), QTextCursor.KeepAnchor)
-            
-            self.setTextCursor(cursor)
+                end = max(end + chars_added - chars_removed, change_end)
+        # setPlainText reports the whole new text twice, so the sum can overshoot
+        end = min(end, self.document().characterCount())
+        self.transaction_range = (min(start, position), end)
+
+    def insertFromMimeData(self, source):
+        # A large paste is highlighted once, after it has been inserted
+        with self.edit_transaction():
+            super().insertFromMimeData(source)
+
+    def load_text(self, text):
+        """Replace the document, highlighting it progressively if it is large."""
+        with self.edit_transaction():
+            self.setPlainText(text)
+
+    def apply_changes(self, changes):
+        """Apply (start, end, text, length) changes, in document order, as one undo step.
+
+        Each change is its own edit, so the highlighter and outline only see the
+        lines it touched, while the cursor and scroll position stay where they are.
+        """
+        # Very large changes are highlighted progressively instead
+        large = sum(change[3] for change in changes) >= Config.progressive_highlight_threshold
+        scroll_bar = self.verticalScrollBar()
+        scroll = scroll_bar.value()
+        cursor = QTextCursor(self.document())
+        with self.edit_transaction() if large else nullcontext():
+            # From the end, so the positions of the remaining changes stay valid
+            for n, (start, end, text, length) in enumerate(reversed(changes)):
+                if n:
+                    cursor.joinPreviousEditBlock()
+                else:
+                    cursor.beginEditBlock()
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.KeepAnchor)
+                cursor.insertText(text)
+                cursor.endEditBlock()
+        scroll_bar.setValue(scroll)
+
+    def begin_streaming(self):
+        """Clear the document and prepare it for text appended in chunks."""
+        self.highlighter.suspend()
+        self.setPlainText("")
+        self.setReadOnly(True)
+        # Appending chunks should not build an undo history
+        self.document().setUndoRedoEnabled(False)
+        self.streamed_length = 0
+
+    def append_text(self, text):
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.streamed_length += len(text)
+
+    def end_streaming(self):
+        """Finish a streamed load, highlighting progressively if the text is large."""
+        self.document().setUndoRedoEnabled(True)
+        self.setReadOnly(False)
+        if self.streamed_length < Config.progressive_highlight_threshold:
+            self.highlighter.stop_progressive()
+            document = self.document()
+            self.highlighter.highlight_blocks(document.begin(), document.lastBlock())
         else:
-            # No selection - insert bold formatting at cursor position
-            cursor.insertText("****")
-            cursor.movePosition(QTextCursor.Left, QTextCursor.MoveAnchor, 2)
-            self.setTextCursor(cursor)
-            
+            self.highlighter.start_progressive()
+
+    def abort_streaming(self):
+        """Drop a partially streamed document."""
+        self.document().setUndoRedoEnabled(True)
+        self.setReadOnly(False)
+        self.load_text("")
+
+    def visible_block_range(self):
+        """Return the numbers of the first and last blocks shown in the viewport."""
+        viewport = self.viewport()
+        first = self.cursorForPosition(QPoint(0, 0)).blockNumber()
+        last = self.cursorForPosition(QPoint(viewport.width(), viewport.height())).blockNumber()
+        return first, last
+
+    def visible_position_range(self):
+        """Return the document positions at the top left and bottom right of the viewport."""
+        viewport = self.viewport()
+        first = self.cursorForPosition(QPoint(0, 0)).position()
+        last = self.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+        return first, last
+
+    def jump_to_block(self, block_number):
+        """Move the cursor to the start of a block and scroll it into view."""
+        block = self.document().findBlockByNumber(block_number)
+        if not block.isValid():
+            return
+        self.setTextCursor(QTextCursor(block))
+        self.ensureCursorVisible()
+        self.setFocus()
+
+    def toggle_bold(self):
+        self.toggle_emphasis('bold', ('**',))
+
     def toggle_italic(self):
+        self.toggle_emphasis('italic', ('*', '_'))
+
+    def find_emphasis(self, start, end, span_type, markers):
+        """Return (start, end, marker length) of emphasis that the selection is, or wraps."""
+        # Spans the highlighter already found, selected with or without their markers
+        span = self.text_access.span_at(start, span_type)
+        if span is not None and (start, end) in ((span[0], span[1]), (span[2], span[3])):
+            return span[0], span[1], span[2] - span[0]
+
+        # Fall back to the neighbouring characters, e.g. in blocks not highlighted yet.
+        # Only marker runs of exactly the marker's width count, so * never matches
+        # one half of **bold**.
+        for marker in markers:
+            if self.text_access.starts_and_ends_with(start, end, marker):
+                return start, end, len(marker)
+            if self.text_access.surrounded_by(start, end, marker):
+                return start - len(marker), end + len(marker), len(marker)
+        return None
+
+    def toggle_emphasis(self, span_type, markers):
+        """Wrap the selection in markers[0], or remove the emphasis it already has."""
         cursor = self.textCursor()
-        if cursor.hasSelection():
-            selected_text = cursor.selectedText()
-            start_pos = cursor.selectionStart()
-            end_pos = cursor.selectionEnd()
-            
-            # Get full text to check surrounding characters
-            full_text = self.toPlainText()
-            
-            # Check if selection includes formatting or if surrounding text has formatting
-            is_italic = False
-            actual_start = start_pos
-            actual_end = end_pos
-            italic_char = '*'
-            
-            # Check if selection includes italic formatting
-            if ((selected_text.startswith('*') and selected_text.endswith('*') and len(selected_text) > 2 and not selected_text.startswith('**')) or
-                (selected_text.startswith('_') and selected_text.endswith('_') and len(selected_text) > 2)):
-                is_italic = True
-                actual_start = start_pos + 1
-                actual_end = end_pos - 1
-                italic_char = selected_text[0]
-            # Check if selection is surrounded by * characters
-            elif (start_pos >= 1 and end_pos <= len(full_text) - 1 and 
-                  full_text[start_pos-1:start_pos] == '*' and 
-                  full_text[end_pos:end_pos+1] == '*' and
-                  (start_pos < 2 or full_text[start_pos-2:start_pos] != '**')):  # Not part of **bold**
-                is_italic = True
-                actual_start = start_pos - 1
-                actual_end = end_pos + 1
-                italic_char = '*'
-            # Check if selection is surrounded by _ characters
-            elif (start_pos >= 1 and end_pos <= len(full_text) - 1 and 
-                  full_text[start_pos-1:start_pos] == '_' and 
-                  full_text[end_pos:end_pos+1] == '_'):
-                is_italic = True
-                actual_start = start_pos - 1
-                actual_end = end_pos + 1
-                italic_char = '_'
-            
-            if is_italic:
-                # Remove italic formatting
-                cursor.setPosition(actual_start)
-                cursor.setPosition(actual_end, QTextCursor.KeepAnchor)
-                new_text = cursor.selectedText()
-                if ((new_text.startswith('*') and new_text.endswith('*') and not new_text.startswith('**')) or
-                    (new_text.startswith('_') and new_text.endswith('_'))):
-                    new_text = new_text[1:-1]
-                cursor.insertText(new_text)
-                # Restore selection on the unformatted text
-                cursor.setPosition(actual_start)
-                cursor.setPosition(actual_start + len(new_text), QTextCursor.KeepAnchor)
-            else:
-                # Add italic formatting (using *)
-                new_text = f"*{selected_text}*"
-                cursor.insertText(new_text)
-                # Restore selection on the formatted text (excluding the *)
-                cursor.setPosition(start_pos + 1)
-                cursor.setPosition(start_pos + 1 + len(selected_text), QTextCursor.KeepAnchor)
-            
+        marker = markers[0]
+        if not cursor.hasSelection():
+            # No selection - insert empty markers and place the cursor between them
+            cursor.insertText(marker * 2)
+            cursor.movePosition(QTextCursor.Left, QTextCursor.MoveAnchor, len(marker))
             self.setTextCursor(cursor)
+            return
+
+        start = cursor.selectionStart()
+        end = cursor.selectionEnd()
+        emphasis = self.find_emphasis(start, end, span_type, markers)
+
+        # Edit only the markers, closing one first so the opening position stays valid
+        cursor.beginEditBlock()
+        if emphasis is not None:
+            outer_start, outer_end, marker_length = emphasis
+            cursor.setPosition(outer_end - marker_length)
+            cursor.setPosition(outer_end, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            cursor.setPosition(outer_start)
+            cursor.setPosition(outer_start + marker_length, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            # Select the now unformatted text
+            selection_start = outer_start
+            selection_end = outer_end - 2 * marker_length
         else:
-            # No selection - insert italic formatting at cursor position
-            cursor.insertText("**")
-            cursor.movePosition(QTextCursor.Left, QTextCursor.MoveAnchor, 1)
-            self.setTextCursor(cursor)
+            cursor.setPosition(end)
+            cursor.insertText(marker)
+            cursor.setPosition(start)
+            cursor.insertText(marker)
+            # Select the formatted text, excluding the markers
+            selection_start = start + len(marker)
+            selection_end = end + len(marker)
+        cursor.endEditBlock()
+
+        cursor.setPosition(selection_start)
+        cursor.setPosition(selection_end, QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+
+
+class MainWidget(EditorMixin, QTextEdit):
+    """Editor backed by QTextEdit."""
+
+    def __init__(self, text_size=12):
+        super().__init__()
+        self.setup_editor(text_size)
+
+
+class PlainTextMainWidget(EditorMixin, QPlainTextEdit):
+    """Editor backed by QPlainTextEdit, whose block-based layout is much lighter
+    than QTextEdit's on very large documents."""
+
+    def __init__(self, text_size=12):
+        super().__init__()
+        self.setup_editor(text_size)
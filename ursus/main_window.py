@@ -1,30 +1,76 @@
-from PySide6.QtWidgets import QMainWindow, QFileDialog, QColorDialog, QErrorMessage, QApplication
-from PySide6.QtGui import QIcon, QKeySequence, QShortcut, QColor
-from PySide6.QtCore import Qt, QSettings
+from PySide6.QtWidgets import QMainWindow, QFileDialog, QColorDialog, QErrorMessage, QApplication, QProgressBar, QTabWidget, QMessageBox
+from PySide6.QtGui import QIcon, QPixmap, QKeySequence, QShortcut, QColor
+from PySide6.QtCore import Qt, QSettings, QTimer
+import os
 import sys
-import ctypes
-import platform
+import time
 
+from . import instrumentation
+from .buffer import Buffer
+from .file_watch import FileWatcher
 from .config import Config
-from .main_widget import MainWidget
+from .html_export import ExportWarmup
+from .resources import ICON_FILE, read_resource
+from .theme import THEMES
+from .outline_panel import OutlinePanel, JumpToHeadingDialog
+from .find_bar import FindBar
 
 class MainWindow(QMainWindow):
-    def __init__(self, text_size=12):
+    def __init__(self, text_size=12, editor_mode=None):
         super().__init__()
-        self.setup_ui(text_size)
+        self.setup_ui(text_size, editor_mode or Config.editor_mode)
 
-    def setup_ui(self, text_size):
+    def setup_ui(self, text_size, editor_mode):
         self.setObjectName("MainWindow")
         self.setWindowTitle(Config.application_name)
         self.settings = QSettings(Config.organization_name, Config.application_name)
-        self.main_widget = MainWidget(text_size)
-        self.setCentralWidget(self.main_widget)
+        self.default_text_size = text_size
+        self.text_size = int(self.settings.value("text_size", text_size))
+        self.editor_mode = editor_mode
+        # (background, foreground) of the theme, or chosen with Ctrl+K, applied to every tab
+        self.theme = self.settings.value("theme", Config.theme)
+        if self.theme not in THEMES:
+            self.theme = Config.theme
+        colors = self.settings.value("colors")
+        self.colors = tuple(colors) if colors else THEMES[self.theme]
 
-        my_icon = QIcon()
-        my_icon.addFile('resources/marky.png')
-        self.setWindowIcon(my_icon)
+        # One tab per buffer; a single tab keeps the window as minimal as before
+        self.tabs = QTabWidget()
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setTabBarAutoHide(True)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.setCentralWidget(self.tabs)
+        self.buffers = {}  # Tab page -> Buffer
+        self.buffer = None
+        self.main_widget = None
+        self.file_watcher = FileWatcher(self)
 
-        if platform.system() == 'Windows':
+        self.outline_panel = OutlinePanel(self)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.outline_panel)
+        self.outline_panel.hide()
+        self.find_bar = FindBar(self)
+        self.addToolBar(Qt.BottomToolBarArea, self.find_bar)
+
+        self.klembord_ready = False
+        # Import mistune and klembord once the window is up rather than on first copy
+        self.export_warmup = ExportWarmup(self)
+        QTimer.singleShot(1000, self.export_warmup.start)
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setMaximumWidth(200)
+        self.statusBar().addPermanentWidget(self.load_progress)
+        self.load_progress.hide()
+
+        icon_pixmap = QPixmap()
+        icon_pixmap.loadFromData(read_resource(ICON_FILE))
+        self.setWindowIcon(QIcon(icon_pixmap))
+
+        if sys.platform == 'win32':
+            # Only needed on Windows, so ctypes is not imported elsewhere
+            import ctypes
             myappid = u'henchoz.marky.0-1'  # arbitrary string
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
@@ -39,6 +85,11 @@ class MainWindow(QMainWindow):
             window_height
         )
 
+        if instrumentation.enabled:
+            from .debug_overlay import DebugOverlay
+            self.debug_overlay = DebugOverlay(self)
+
+        self.new_file()
         self.create_shortcuts()
 
     def create_shortcuts(self):
@@ -48,50 +99,267 @@ class MainWindow(QMainWindow):
             'save_as': (QKeySequence("Ctrl+Shift+S"), self.save_file_as),
             'copy_html': (QKeySequence("Ctrl+Shift+C"), self.copy_as_html),
             'new': (QKeySequence("Ctrl+N"), self.new_file),
+            'close_tab': (QKeySequence("Ctrl+W"), lambda: self.close_tab(self.tabs.currentIndex())),
+            'next_tab': (QKeySequence("Ctrl+Tab"), lambda: self.switch_tab(1)),
+            'previous_tab': (QKeySequence("Ctrl+Shift+Tab"), lambda: self.switch_tab(-1)),
             'change_color': (QKeySequence("Ctrl+K"), self.select_colors),
-            'toggle_bold': (QKeySequence("Ctrl+B"), self.main_widget.toggle_bold),
-            'toggle_italic': (QKeySequence("Ctrl+I"), self.main_widget.toggle_italic),
-            'exit': (QKeySequence(Qt.Key_Escape), sys.exit)
+            'next_theme': (QKeySequence("Ctrl+Shift+K"), self.next_theme),
+            'zoom_in': (QKeySequence(QKeySequence.ZoomIn), lambda: self.zoom(1)),
+            'zoom_in_equals': (QKeySequence("Ctrl+="), lambda: self.zoom(1)),
+            'zoom_out': (QKeySequence(QKeySequence.ZoomOut), lambda: self.zoom(-1)),
+            'zoom_reset': (QKeySequence("Ctrl+0"), lambda: self.zoom(self.default_text_size - self.text_size)),
+            'toggle_bold': (QKeySequence("Ctrl+B"), self.toggle_bold),
+            'toggle_italic': (QKeySequence("Ctrl+I"), self.toggle_italic),
+            'outline': (QKeySequence("Ctrl+Shift+O"), self.outline_panel.toggle),
+            'jump_to_heading': (QKeySequence("Ctrl+J"), self.jump_to_heading),
+            'find': (QKeySequence("Ctrl+F"), self.find_bar.open),
+            'replace': (QKeySequence("Ctrl+H"), lambda: self.find_bar.open(replace=True)),
+            'exit': (QKeySequence(Qt.Key_Escape), self.on_escape)
         }
+        if instrumentation.enabled:
+            self.shortcuts['debug_overlay'] = (QKeySequence(Qt.Key_F12), self.debug_overlay.toggle)
         for key, (seq, func) in self.shortcuts.items():
             shortcut = QShortcut(seq, self)
             shortcut.activated.connect(func)
 
+    def toggle_bold(self):
+        self.main_widget.toggle_bold()
+
+    def toggle_italic(self):
+        self.main_widget.toggle_italic()
+
+    def jump_to_heading(self):
+        JumpToHeadingDialog(self.main_widget, self).exec()
+
+    def add_buffer(self, buffer):
+        """Add a tab for buffer and show it, which creates its editor."""
+        self.buffers[buffer.page] = buffer
+        self.tabs.addTab(buffer.page, buffer.title())
+        self.tabs.setCurrentWidget(buffer.page)
+        return buffer
+
+    def on_tab_changed(self, index):
+        page = self.tabs.widget(index)
+        if page is None:
+            return
+        self.buffer = self.buffers[page]
+        self.buffer.last_shown = time.monotonic()
+        # Binds the find bar and outline through on_editor_replaced if the editor is new
+        editor = self.buffer.ensure_editor()
+        if self.main_widget is not editor:
+            self.on_editor_replaced(self.buffer)
+        # Background tabs catch up with zooming when they are shown
+        editor.change_text_size(self.text_size)
+        self.update_tab_title(self.buffer)
+        self.update_load_progress(self.buffer)
+        self.evict_buffers()
+        # Catches changes the watcher missed, e.g. on network drives
+        self.buffer.on_disk_changed()
+
+    def on_editor_replaced(self, buffer):
+        """Point the window's tools at buffer's editor if its tab is the current one."""
+        if buffer is not self.buffer or buffer.editor is None:
+            return
+        self.main_widget = buffer.editor
+        self.main_widget.setFocus()
+        self.outline_panel.set_editor(self.main_widget)
+        self.find_bar.set_editor(self.main_widget)
+        if instrumentation.enabled:
+            self.debug_overlay.raise_()
+
+    def switch_tab(self, step):
+        self.tabs.setCurrentIndex((self.tabs.currentIndex() + step) % self.tabs.count())
+
+    def close_tab(self, index):
+        page = self.tabs.widget(index)
+        if page is None:
+            return
+        buffer = self.buffers[page]
+        discard = False
+        # A blank tab has nothing worth saving, even if it was typed in
+        if buffer.is_modified() and not buffer.is_blank():
+            answer = QMessageBox.question(
+                self, "Close Tab", f"Save the changes to {buffer.name()}?",
+                QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Save)
+            if answer == QMessageBox.Cancel:
+                return
+            if answer == QMessageBox.Save and not self.save_before_close(buffer):
+                return
+            discard = answer == QMessageBox.Discard
+        del self.buffers[page]
+        if buffer is self.buffer:
+            if self.find_bar.isVisible():
+                self.find_bar.close_bar()
+            else:
+                self.find_bar.stop()
+        self.tabs.removeTab(index)
+        buffer.close(discard=discard)
+        buffer.deleteLater()
+        if not self.buffers:
+            self.new_file()
+
+    def save_before_close(self, buffer):
+        """Save buffer and wait for the write. Return False if it is still unsaved."""
+        file_path = buffer.file_path
+        if file_path is None:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Save As...", "", "Text Files (*.txt);;All Files (*.*)")
+            if not file_path:
+                return False
+        buffer.save(file_path)
+        buffer.wait_for_save()
+        # Deliver the queued saved signal, which marks the document unmodified
+        QApplication.sendPostedEvents(buffer)
+        return not buffer.is_modified()
+
+    def evict_buffers(self):
+        """Drop the editors of unmodified background tabs, least recently shown
+        first, while the open text exceeds the memory budget."""
+        buffers = list(self.buffers.values())
+        total = sum(buffer.memory_estimate() for buffer in buffers)
+        if total <= Config.buffer_memory_budget:
+            return
+        for buffer in sorted(buffers, key=lambda buffer: buffer.last_shown):
+            if total <= Config.buffer_memory_budget:
+                break
+            size = buffer.memory_estimate()
+            if buffer is not self.buffer and buffer.evict():
+                total -= size
+
+    def update_tab_title(self, buffer):
+        index = self.tabs.indexOf(buffer.page)
+        if index < 0:
+            return
+        title = buffer.title()
+        self.tabs.setTabText(index, title)
+        self.tabs.setTabToolTip(index, buffer.file_path or "")
+        if buffer is self.buffer:
+            self.setWindowTitle(f"{title} - {Config.application_name}")
+
+    def update_load_progress(self, buffer, value=None):
+        """Show the load progress of the current tab's buffer."""
+        if buffer is not self.buffer:
+            return
+        if value is not None:
+            self.load_progress.setValue(value)
+        self.load_progress.setVisible(buffer.file_loader is not None)
+
     def select_colors(self):
         fg = QColorDialog.getColor(QColor('green'), self, "Select Text Color")
         bg = QColorDialog.getColor(QColor('black'), self, "Select Background Color")
         if fg.isValid() and bg.isValid():
-            self.main_widget.change_colors(bg.name(), fg.name())
+            self.set_colors((bg.name(), fg.name()))
+            self.settings.setValue("colors", list(self.colors))
+
+    def next_theme(self):
+        names = list(THEMES)
+        self.theme = names[(names.index(self.theme) + 1) % len(names)]
+        self.settings.setValue("theme", self.theme)
+        # A theme replaces colors chosen with Ctrl+K
+        self.settings.remove("colors")
+        self.set_colors(THEMES[self.theme])
+        self.statusBar().showMessage(f"Theme: {self.theme}", 2000)
+
+    def set_colors(self, colors):
+        self.colors = colors
+        for buffer in self.buffers.values():
+            if buffer.editor is not None:
+                buffer.editor.change_colors(*self.colors)
+
+    def zoom(self, step):
+        """Change the text size of the current tab; other tabs follow when shown."""
+        size = min(Config.max_text_size, max(Config.min_text_size, self.text_size + step))
+        if size == self.text_size:
+            return
+        self.text_size = size
+        self.settings.setValue("text_size", size)
+        self.main_widget.change_text_size(size)
+        self.statusBar().showMessage(f"Text size: {size}", 2000)
+
+    def on_escape(self):
+        if self.buffer.file_loader is not None:
+            self.buffer.cancel_load()
+        elif self.find_bar.isVisible():
+            self.find_bar.close_bar()
+        else:
+            self.close()
+
+    def closeEvent(self, event):
+        self.find_bar.stop()
+        for buffer in self.buffers.values():
+            buffer.close()
+        self.export_warmup.wait()
+        super().closeEvent(event)
+
+    def recover_session(self, session_dir):
+        """Restore the unsaved text of an editor that did not shut down cleanly, in a new tab."""
+        buffer = self.buffer if self.buffer.is_blank() else self.add_buffer(Buffer(self))
+        if buffer.recover_session(session_dir):
+            self.statusBar().showMessage("Recovered unsaved changes", 5000)
+
+    def is_blank(self):
+        """Return True if the window has a single tab with no file and no text."""
+        return len(self.buffers) == 1 and self.buffer.is_blank()
 
     def new_file(self):
-        self.main_widget.setPlainText("")
-        self.current_file_path = None
+        self.add_buffer(Buffer(self))
 
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Markdown Files (*.md *.txt);;Text Files (*.txt);;All Files (*.*)")
         if file_path:
-            with open(file_path, "r", encoding="utf-8") as file:
-                self.main_widget.setPlainText(file.read())
-            self.current_file_path = file_path
+            self.open_path(file_path)
+
+    def open_path(self, file_path, activate=True):
+        """Open file_path in a tab, or find the tab that already has it.
+
+        The file is only read once its tab is shown, so a tab opened with
+        activate=False costs nothing until it is selected. An activated tab
+        replaces the current one if that is blank.
+        """
+        file_path = os.path.abspath(file_path)
+        for buffer in self.buffers.values():
+            if buffer.file_path == file_path:
+                if activate:
+                    self.tabs.setCurrentWidget(buffer.page)
+                return buffer
+        buffer = Buffer(self, file_path)
+        if not activate:
+            self.buffers[buffer.page] = buffer
+            self.tabs.addTab(buffer.page, buffer.title())
+            self.tabs.setTabToolTip(self.tabs.indexOf(buffer.page), file_path)
+            return buffer
+        blank = self.buffer if self.buffer.is_blank() else None
+        self.add_buffer(buffer)
+        if blank is not None:
+            self.close_tab(self.tabs.indexOf(blank.page))
+        return buffer
+
+    def load_file(self, file_path):
+        """Stream a file into the current tab."""
+        self.buffer.load_file(file_path)
 
     def _save_file(self, file_path):
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(self.main_widget.toPlainText())
-        self.current_file_path = file_path
+        self.buffer.save(file_path)
+
+    def wait_for_save(self):
+        """Block until in-flight and coalesced saves of every tab have been written."""
+        for buffer in self.buffers.values():
+            buffer.wait_for_save()
 
     def copy_as_html(self):
-        import mistune
+        self.buffer.copy_as_html()
+
+    def set_clipboard_html(self, markdown_text, html_text):
         import klembord
-        markdown_text = self.main_widget.toPlainText()
-        html_text = mistune.markdown(markdown_text)
-        klembord.init()
+        if not self.klembord_ready:
+            klembord.init()
+            self.klembord_ready = True
         klembord.set_with_rich_text(markdown_text, html_text)
 
     def save_file(self):
-        try:
-            self._save_file(self.current_file_path)
-        except AttributeError:
+        if self.buffer.file_path is None:
             self.save_file_as()
+        else:
+            self._save_file(self.buffer.file_path)
 
     def save_file_as(self):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save As...", "", "Text Files (*.txt);;All Files (*.*)")
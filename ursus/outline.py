@@ -0,0 +1,148 @@
+from PySide6.QtCore import QObject, Signal
+from bisect import bisect_left
+import heapq
+
+
+def fuzzy_score(query, text):
+    """Score text for a query whose characters must appear in order, or return None.
+
+    Consecutive characters and characters at the start of words score higher.
+    """
+    text_lower = text.lower()
+    score = 0
+    position = 0
+    previous = -2
+    for char in query.lower():
+        index = text_lower.find(char, position)
+        if index < 0:
+            return None
+        if index == previous + 1:
+            score += 3
+        if index == 0 or not text_lower[index - 1].isalnum():
+            score += 2
+        previous = index
+        position = index + 1
+    # Among equal matches, prefer shorter headings
+    return score - len(text) / 1000
+
+
+class OutlineIndex(QObject):
+    """Headings of a document, kept up to date from the highlighter's per-block results.
+
+    The highlighter reports each block it formats through set_heading. Edits that
+    add or remove lines only drop the headings of removed blocks and shift the
+    numbers of the headings after them, so the document text is never scanned
+    again. The shift is applied lazily: an edit only renumbers the headings
+    between it and the previous edit.
+    """
+
+    # Index of the first changed heading, number of headings removed there and added
+    changed = Signal(int, int, int)
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        # Sorted block numbers of headings, and their (level, title). Numbers from
+        # shift_index on are still to be moved by pending_shift.
+        self.numbers = []
+        self.headings = []
+        self.shift_index = 0
+        self.pending_shift = 0
+        self.block_count = document.blockCount()
+        # Must be connected before the highlighter, which reports the edited blocks
+        # under their new numbers while handling the same signal
+        document.contentsChange.connect(self.on_contents_change)
+
+    def number(self, index):
+        """Return the block number of the heading at index."""
+        number = self.numbers[index]
+        return number + self.pending_shift if index >= self.shift_index else number
+
+    def find(self, block_number):
+        """Return the index of the first heading at or after block_number."""
+        index = bisect_left(self.numbers, block_number, 0, self.shift_index)
+        if index < self.shift_index:
+            return index
+        return bisect_left(self.numbers, block_number - self.pending_shift, self.shift_index)
+
+    def move_shift(self, index):
+        """Apply the pending shift up to index, so that it starts there."""
+        if self.pending_shift:
+            if index > self.shift_index:
+                self.numbers[self.shift_index:index] = [
+                    number + self.pending_shift for number in self.numbers[self.shift_index:index]]
+            else:
+                self.numbers[index:self.shift_index] = [
+                    number - self.pending_shift for number in self.numbers[index:self.shift_index]]
+        self.shift_index = index
+
+    def set_heading(self, block_number, level, title):
+        """Record the heading of a block, or that it has none when level is 0."""
+        index = self.find(block_number)
+        present = index < len(self.numbers) and self.number(index) == block_number
+        if level:
+            heading = (level, title)
+            if present:
+                if self.headings[index] == heading:
+                    return
+                self.headings[index] = heading
+                self.changed.emit(index, 1, 1)
+                return
+            if index < self.shift_index:
+                self.numbers.insert(index, block_number)
+                self.shift_index += 1
+            else:
+                self.numbers.insert(index, block_number - self.pending_shift)
+            self.headings.insert(index, heading)
+            self.changed.emit(index, 0, 1)
+        elif present:
+            del self.numbers[index]
+            del self.headings[index]
+            if index < self.shift_index:
+                self.shift_index -= 1
+            self.changed.emit(index, 1, 0)
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        block_count = self.document.blockCount()
+        delta = block_count - self.block_count
+        self.block_count = block_count
+        # With an unchanged number of lines, every edited block keeps its number
+        # and is reported again by the highlighter
+        if not delta:
+            return
+        # The highlighter reports the edited blocks, up to last_new, again. Of the
+        # blocks after them, only those that were removed lose their headings.
+        end_block = self.document.findBlock(min(position + chars_added, self.document.characterCount() - 1))
+        last_new = end_block.blockNumber()
+        last_old = last_new - delta
+        end = self.find(last_old + 1)
+        start = self.find(last_new + 1) if delta < 0 else end
+        self.move_shift(end)
+        if start < end:
+            del self.numbers[start:end]
+            del self.headings[start:end]
+            self.shift_index = start
+        self.pending_shift += delta
+        if start < end:
+            self.changed.emit(start, end - start, 0)
+
+    def entries(self):
+        """Return (block number, level, title) for every heading in document order."""
+        return [(number, level, title) for number, (level, title) in zip(self.all_numbers(), self.headings)]
+
+    def all_numbers(self):
+        shift = self.pending_shift
+        return self.numbers[:self.shift_index] + [number + shift for number in self.numbers[self.shift_index:]]
+
+    def search(self, query, limit=50):
+        """Return the best fuzzy matches of query as (block number, level, title)."""
+        if not query:
+            return self.entries()[:limit]
+        scored = []
+        for number, (level, title) in zip(self.all_numbers(), self.headings):
+            score = fuzzy_score(query, title)
+            if score is not None:
+                # Ties go to the heading nearer the top
+                scored.append((score, -number, level, title))
+        best = heapq.nlargest(limit, scored)
+        return [(-negative_number, level, title) for _, negative_number, level, title in best]
@@ -0,0 +1,178 @@
+from PySide6.QtWidgets import (QDockWidget, QTreeWidget, QTreeWidgetItem, QDialog, QLineEdit,
+                               QListWidget, QListWidgetItem, QVBoxLayout)
+from PySide6.QtCore import Qt
+
+
+class OutlinePanel(QDockWidget):
+    """Collapsible tree of the document's headings; activating one jumps to it."""
+
+    # Item data role holding a heading's level
+    LEVEL_ROLE = Qt.UserRole
+
+    def __init__(self, parent):
+        super().__init__("Outline", parent)
+        self.setObjectName("OutlinePanel")
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.itemActivated.connect(self.on_item_activated)
+        self.tree.itemClicked.connect(self.on_item_activated)
+        self.setWidget(self.tree)
+
+        self.editor = None
+        # Tree items in the order of the outline's headings
+        self.items = []
+        self.dirty = True
+
+    def set_editor(self, editor):
+        """Show the outline of editor, e.g. after the editor widget was replaced."""
+        if self.editor is not None:
+            self.editor.outline.changed.disconnect(self.on_outline_changed)
+        self.editor = editor
+        editor.outline.changed.connect(self.on_outline_changed)
+        self.dirty = True
+        if self.isVisible():
+            self.refresh()
+
+    def toggle(self):
+        self.setVisible(not self.isVisible())
+
+    def on_outline_changed(self, index, removed, added):
+        # A hidden panel is rebuilt when it is shown again
+        if self.dirty or not self.isVisible():
+            self.dirty = True
+            return
+        headings = self.editor.outline.headings
+        if removed == added == 1 and self.items[index].data(0, self.LEVEL_ROLE) == headings[index][0]:
+            # Renamed in place
+            self.items[index].setText(0, headings[index][1])
+            return
+        self.update_items(index, removed, added)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.dirty:
+            self.refresh()
+
+    def create_item(self, level, title):
+        item = QTreeWidgetItem([title])
+        item.setData(0, self.LEVEL_ROLE, level)
+        return item
+
+    def refresh(self):
+        """Rebuild the tree, nesting each heading under the nearest higher-level one."""
+        self.dirty = False
+        collapsed = self.collapsed_titles()
+        self.tree.clear()
+        # Open parents as (level, item), from the top level down
+        parents = []
+        items = []
+        self.items = []
+        for level, title in self.editor.outline.headings:
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            item = self.create_item(level, title)
+            self.items.append(item)
+            if parents:
+                parents[-1][1].addChild(item)
+            else:
+                items.append(item)
+            parents.append((level, item))
+        self.tree.addTopLevelItems(items)
+        self.tree.expandAll()
+        # Keep sections the user collapsed collapsed across rebuilds
+        if collapsed:
+            for item in self.items:
+                if item.text(0) in collapsed:
+                    item.setExpanded(False)
+
+    def update_items(self, index, removed, added):
+        """Replace the items of removed headings by items of added ones, moving only
+        the following items whose parent changes."""
+        root = self.tree.invisibleRootItem()
+        old_items = self.items[index:index + removed]
+        for item in old_items:
+            # Children are placed again below, with the other following items
+            item.takeChildren()
+            parent = item.parent() or (root if item.treeWidget() is not None else None)
+            if parent is not None:
+                parent.removeChild(item)
+        new_items = [self.create_item(level, title)
+                     for level, title in self.editor.outline.headings[index:index + added]]
+        self.items[index:index + removed] = new_items
+        for offset, item in enumerate(new_items):
+            self.place_item(index + offset, root)
+            item.setExpanded(True)
+
+        # Following headings deeper than every changed one may need another parent
+        lowest = min(item.data(0, self.LEVEL_ROLE) for item in old_items + new_items)
+        for position in range(index + added, len(self.items)):
+            if self.items[position].data(0, self.LEVEL_ROLE) <= lowest:
+                break
+            self.place_item(position, root)
+
+    def place_item(self, position, root):
+        """Attach the item at position under the nearest preceding item of a lower level."""
+        item = self.items[position]
+        level = item.data(0, self.LEVEL_ROLE)
+        # Climb from the preceding item to the new parent; the last item passed is the previous sibling
+        sibling = None
+        parent = self.items[position - 1] if position else root
+        while parent is not root and parent.data(0, self.LEVEL_ROLE) >= level:
+            sibling = parent
+            parent = parent.parent() or root
+        current = item.parent() or (root if item.treeWidget() is not None else None)
+        if current is parent:
+            return
+        if current is not None:
+            current.removeChild(item)
+        parent.insertChild(parent.indexOfChild(sibling) + 1 if sibling is not None else 0, item)
+
+    def collapsed_titles(self):
+        return {item.text(0) for item in self.items if item.childCount() and not item.isExpanded()}
+
+    def on_item_activated(self, item):
+        # Headings move as lines are added above them, so the number is looked up now
+        self.editor.jump_to_block(self.editor.outline.number(self.items.index(item)))
+
+
+class JumpToHeadingDialog(QDialog):
+    """Filter headings by a fuzzy query and jump to the selected one."""
+
+    MAX_RESULTS = 50
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.setWindowTitle("Jump to Heading")
+        self.query = QLineEdit()
+        self.query.setPlaceholderText("Heading")
+        self.results = QListWidget()
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.query)
+        layout.addWidget(self.results)
+        self.query.textChanged.connect(self.update_results)
+        self.query.returnPressed.connect(self.accept)
+        self.results.itemActivated.connect(self.accept)
+        # Let the arrow keys move through the results while typing
+        self.query.installEventFilter(self)
+        self.update_results("")
+
+    def eventFilter(self, obj, event):
+        if event.type() == event.Type.KeyPress and event.key() in (Qt.Key_Up, Qt.Key_Down):
+            self.results.keyPressEvent(event)
+            return True
+        return super().eventFilter(obj, event)
+
+    def update_results(self, query):
+        self.results.clear()
+        for number, level, title in self.editor.outline.search(query, self.MAX_RESULTS):
+            item = QListWidgetItem("  " * (level - 1) + title)
+            item.setData(Qt.UserRole, number)
+            self.results.addItem(item)
+        self.results.setCurrentRow(0)
+
+    def accept(self):
+        item = self.results.currentItem()
+        super().accept()
+        if item is not None:
+            self.editor.jump_to_block(item.data(Qt.UserRole))
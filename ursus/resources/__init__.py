@@ -0,0 +1,11 @@
+"""Fonts and icons shipped inside the package, found wherever it is installed."""
+
+from importlib.resources import files
+
+FONT_FILES = ("Montserrat-Regular.ttf", "Montserrat-Italic.ttf", "Montserrat-Bold.ttf")
+ICON_FILE = "marky.png"
+
+
+def read_resource(name):
+    """Return the contents of a packaged resource file."""
+    return files(__name__).joinpath(name).read_bytes()
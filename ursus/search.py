@@ -0,0 +1,95 @@
+from PySide6.QtCore import QThread, Signal
+from bisect import bisect_left
+import re
+
+# Characters outside the BMP take two UTF-16 code units, and so two document positions
+_astral_pattern = re.compile('[\U00010000-\U0010ffff]')
+
+
+def find_astral(text):
+    """Return the string indices of characters that take two document positions."""
+    if text.isascii():
+        return []
+    return [match.start() for match in _astral_pattern.finditer(text)]
+
+
+def document_length(text):
+    """Return the length of text in document positions (UTF-16 code units)."""
+    return len(text) + len(find_astral(text))
+
+
+def find_positions(text, query, case_sensitive=False, candidates=None, astral=None):
+    """Yield the document position of every occurrence of query in text, in order.
+
+    Overlapping occurrences are included, so the occurrences of a longer query
+    are always a subset of those of its prefix. Given the positions of a prefix
+    as candidates, only those are checked instead of scanning the text.
+    """
+    if astral is None:
+        astral = find_astral(text)
+    if case_sensitive:
+        def matches_at(index):
+            return text.startswith(query, index)
+
+        def search(index):
+            return text.find(query, index)
+    else:
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+
+        def matches_at(index):
+            return pattern.match(text, index) is not None
+
+        def search(index):
+            match = pattern.search(text, index)
+            return match.start() if match else -1
+
+    if candidates is not None:
+        document_astral = [index + n for n, index in enumerate(astral)]
+        for position in candidates:
+            index = position - bisect_left(document_astral, position) if astral else position
+            if matches_at(index):
+                yield position
+        return
+
+    index = search(0)
+    while index >= 0:
+        yield index + bisect_left(astral, index) if astral else index
+        index = search(index + 1)
+
+
+class SearchWorker(QThread):
+    """Finds occurrences of a query in a text snapshot on a worker thread,
+    streaming their document positions back in batches."""
+
+    matches_found = Signal(list)
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, text, query, case_sensitive, candidates=None, astral=None, parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.query = query
+        self.case_sensitive = case_sensitive
+        self.candidates = candidates
+        # Computed on the first search of a snapshot and reused while narrowing it
+        self.astral = astral
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.astral is None:
+            self.astral = find_astral(self.text)
+        batch = []
+        for position in find_positions(self.text, self.query, self.case_sensitive,
+                                       self.candidates, self.astral):
+            if self.cancelled:
+                return
+            batch.append(position)
+            if len(batch) >= self.BATCH_SIZE:
+                self.matches_found.emit(batch)
+                batch = []
+        if batch and not self.cancelled:
+            self.matches_found.emit(batch)
+        self.candidates = None
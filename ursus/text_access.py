@@ -0,0 +1,51 @@
+from PySide6.QtGui import QTextCursor
+
+
+class TextAccess:
+    """Reads small neighbourhoods of an editor's document without copying all of its text."""
+
+    def __init__(self, editor):
+        self.document = editor.document()
+        self.highlighter = editor.highlighter
+
+    def text(self, start, end):
+        """Return the text between two positions, clamped to the document."""
+        start = max(0, start)
+        end = min(end, self.document.characterCount() - 1)
+        if end <= start:
+            return ""
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        # selectedText() returns line breaks as U+2029
+        return cursor.selectedText().replace("\u2029", "\n")
+
+    def marker_at(self, position, marker):
+        """Return True if marker is at position, as a whole run of its character,
+        e.g. * that is not one half of **."""
+        length = len(marker)
+        char = marker[0]
+        return (self.text(position, position + length) == marker
+                and self.text(position - 1, position) != char
+                and self.text(position + length, position + length + 1) != char)
+
+    def starts_and_ends_with(self, start, end, marker):
+        """Return True if the range [start, end) begins and ends with marker."""
+        length = len(marker)
+        return (end - start > 2 * length and self.marker_at(start, marker)
+                and self.marker_at(end - length, marker))
+
+    def surrounded_by(self, start, end, marker):
+        """Return True if marker immediately precedes start and follows end."""
+        length = len(marker)
+        return self.marker_at(start - length, marker) and self.marker_at(end, marker)
+
+    def span_at(self, position, span_type):
+        """Return (start, end, content start, content end) of the highlighted span of
+        span_type containing position, as document positions, or None."""
+        block, span = self.highlighter.formatting_range_at(position)
+        if span is None or span.type != span_type:
+            return None
+        offset = block.position()
+        return (offset + span.start, offset + span.end,
+                offset + span.content_start, offset + span.content_end)
@@ -0,0 +1,25 @@
+from PySide6.QtGui import QPalette, QColor
+
+# Editor color themes: name -> (background, foreground)
+THEMES = {
+    "light": ("white", "black"),
+    "dark": ("#1e1e1e", "#d4d4d4"),
+    "terminal": ("black", "green"),
+    "sepia": ("#f4ecd8", "#5b4636"),
+}
+
+_palettes = {}
+
+
+def palette_for(colors):
+    """Return the palette for a (background, foreground) pair, shared by all editors."""
+    palette = _palettes.get(colors)
+    if palette is None:
+        background, foreground = QColor(colors[0]), QColor(colors[1])
+        palette = QPalette()
+        for role in (QPalette.Base, QPalette.Window):
+            palette.setColor(role, background)
+        for role in (QPalette.Text, QPalette.WindowText):
+            palette.setColor(role, foreground)
+        _palettes[colors] = palette
+    return palette